@@ -43,4 +43,7 @@ if __name__ == "__main__":
     setup_logger("database", bot_config)
 
     bot = DiscordBot(bot_config, database_config, scraper_config)
-    bot.run()
+    try:
+        bot.run()
+    finally:
+        bot.bot_service.close()
@@ -0,0 +1,58 @@
+import argparse
+import logging
+
+from src.scraping.fake_vinted import FakeVintedServer
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Fake Vinted API")
+    parser.add_argument(
+        "--fixtures-directory",
+        type=str,
+        default="./fixtures",
+        help="Directory of the responses recorded with record_directory",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="Seconds added to every response",
+    )
+    parser.add_argument(
+        "--per-page",
+        type=int,
+        default=96,
+        help="Catalog items per page",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="Probability of answering an API request with an error code",
+    )
+    parser.add_argument(
+        "--error-codes",
+        type=int,
+        nargs="+",
+        default=[100, 104, 106],
+        help="Error codes to inject",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO)
+
+    server = FakeVintedServer(
+        args.fixtures_directory,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        per_page=args.per_page,
+        error_rate=args.error_rate,
+        error_codes=args.error_codes,
+    )
+    server.serve_forever()
@@ -1,4 +1,7 @@
 import argparse
+import signal
+import sys
+import time
 
 from src import (
     BotService,
@@ -6,6 +9,7 @@ from src import (
     Database,
     Monitor,
     bot_config_schema,
+    create_http_client,
     database_config_schema,
     scraper_config_schema,
     setup_logger,
@@ -65,14 +69,26 @@ if __name__ == "__main__":
     setup_logger("database", database_config)
     setup_logger("bot", bot_config)
 
-    database = Database(database_config, args.save_to_db)
-    monitor = Monitor(scraper_config)
-    bot_service = BotService(bot_config, database_config, scraper_config)
+    http_client = create_http_client(scraper_config)
+    bot_service = BotService(bot_config, database_config, scraper_config, http_client)
+    database = Database(database_config, args.save_to_db, bot_service.on_error)
+    monitor = Monitor(scraper_config, http_client)
 
-    if args.run_random_scraping:
-        monitor.run_background_scraping(bot_service, database)
-    if args.run_background_scraping:
-        monitor.run_random_scraping(bot_service, database)
-    if args.run_watch:
-        while True:
-            monitor.run_watch(bot_service, database)
+    # stopping the container raises SystemExit, leaving time to write the buffered documents
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        if args.run_random_scraping:
+            monitor.run_background_scraping(bot_service, database)
+        if args.run_background_scraping:
+            monitor.run_random_scraping(bot_service, database)
+        while args.run_watch or args.run_random_scraping or args.run_background_scraping:
+            if args.run_watch:
+                monitor.run_watch(bot_service, database)
+            else:
+                time.sleep(scraper_config["recheck_interval"])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # nothing is upserted anymore once the buffered documents are written
+        monitor.stop()
+        database.close()
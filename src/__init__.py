@@ -3,6 +3,7 @@ from src.bot.bot_service import BotService
 from src.configs.config import Config
 from src.configs.schemas import *
 from src.database import Database
+from src.http_client import HttpClient, RecordingHttpClient, create_http_client
 from src.logger.logger import setup as setup_logger
 from src.scraping.monitor import Monitor
 from src.scraping.scraper import Scraper
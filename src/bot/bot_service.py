@@ -5,17 +5,26 @@ import requests
 
 import src.utils as utils
 from src.bot.embeds_builder import EmbedBuilder
+from src.exceptions import CircuitOpenException, RetryException
+from src.http_client import create_http_client
+from src.scraping.catalog_index import CatalogIndex
+from src.scraping.query_generator import QueryGenerator
+from src.scraping.scraper import Scraper
 
 logger = logging.getLogger("bot")
 
 
 class BotService:
-    def __init__(self, bot_config, database_config, scraper_config):
+    def __init__(self, bot_config, database_config, scraper_config, http_client=None):
         self.bot_config = bot_config
         self.database_config = database_config
         self.scraper_config = scraper_config
+        self.http_client = http_client or create_http_client(scraper_config)
 
         self.embeds_builder = EmbedBuilder(bot_config)
+        self.catalog_index = CatalogIndex(scraper_config, self._scrape_cats)
+        self._query_generator = QueryGenerator()
+        self._scraper = None
 
     def get_webhooks(self):
         all_webhooks = self.bot_config["watch"]
@@ -25,6 +34,28 @@ class BotService:
         webhooks = self.bot_config["watch"]
         return {webhook: value for webhook, value in webhooks.items() if 'background_scraping' in value}
 
+    def validate_watch_url(self, url):
+        params = self._query_generator.get_query(url)
+        try:
+            unknown_catalogs = [
+                catalog_id for catalog_id in params.get("catalog_ids", [])
+                if not catalog_id.isdigit() or int(catalog_id) not in self.catalog_index
+            ]
+        except (requests.exceptions.RequestException, RetryException, CircuitOpenException) as e:
+            logger.warning(f"Couldn't check catalogs of {url}: {e}")
+            return
+        if unknown_catalogs:
+            raise ValueError(f"Unknown catalogs: {', '.join(unknown_catalogs)}")
+
+    def _scrape_cats(self):
+        if not self._scraper:
+            self._scraper = Scraper(self.scraper_config, self.http_client, "bot")
+        return self._scraper.scrape_cats()
+
+    def close(self):
+        if self._scraper:
+            self._scraper.close()
+
     def process_item(self, json_item, json_user, webhook):
         if self.validate_item(json_item, json_user, webhook):
             self.send_item(json_item, json_user, webhook)
@@ -38,6 +69,19 @@ class BotService:
             and self._validate_min_favourites_views_ratio(json_item, webhook)
         )
 
+    def prefilter_item(self, json_item, webhook):
+        # catalog entries only carry part of the item, filters on missing fields are left to validate_item
+        return (
+            ("favourite_count" not in json_item or self._validate_min_favourites(json_item, webhook))
+            and ("created_at_ts" not in json_item or self._validate_max_days_offset(json_item, webhook))
+            and ("view_count" not in json_item or self._validate_min_views(json_item, webhook))
+            and (
+                "favourite_count" not in json_item
+                or "view_count" not in json_item
+                or self._validate_min_favourites_views_ratio(json_item, webhook)
+            )
+        )
+
     def _validate_min_rating(self, json_item, json_user, webhook):
         if "min_rating" in self.bot_config["watch"][webhook]:
             user_rating = utils.get_feedback_out_of_5(json_user)
@@ -141,10 +185,19 @@ class BotService:
         if logs_channel:
             self.send_data(data, logs_channel)
 
-    def on_finish(self):
+    def on_finish(self, next_recheck=None, summary=None):
+        if next_recheck is None:
+            next_recheck = self.scraper_config["recheck_interval"]
+        found = ""
+        if summary:
+            found = (
+                f"{summary['polls']} check{'s' if summary['polls'] > 1 else ''}, "
+                f"{summary['new_items']} new item{'s' if summary['new_items'] != 1 else ''}, "
+                f"{summary['errors']} error{'s' if summary['errors'] != 1 else ''}. "
+            )
         data = {
-            "content": f"️️🏁 Finished searching for items. "
-                       f"Next recheck in {self.scraper_config['recheck_interval'] / 60} minutes.",
+            "content": f"️️🏁 Finished searching for items. {found}"
+                       f"Next recheck in {round(next_recheck / 60, 1)} minutes.",
         }
         logs_channel = self.bot_config["logs_channel"]
         if logs_channel:
@@ -158,8 +211,25 @@ class BotService:
         if logs_channel:
             self.send_data(data, logs_channel)
 
+    def on_circuit_breaker_open(self, endpoint, state):
+        data = {
+            "content": f"️️⏸️ Vinted is rejecting {endpoint} requests, "
+                       f"paused after {state['failures']} failures.",
+        }
+        logs_channel = self.bot_config["logs_channel"]
+        if logs_channel:
+            self.send_data(data, logs_channel)
+
+    def on_circuit_breaker_closed(self, endpoint):
+        data = {
+            "content": f"️️▶️ Vinted is accepting {endpoint} requests again.",
+        }
+        logs_channel = self.bot_config["logs_channel"]
+        if logs_channel:
+            self.send_data(data, logs_channel)
+
     def send_data(self, data, webhook):
-        res = requests.post(webhook, json=self._format_data(data))
+        res = self.http_client.post(webhook, json=self._format_data(data))
         if res:
             if res.status_code == 204:
                 logger.debug(f"Sent message to Discord: {res.status_code} {res.text}")
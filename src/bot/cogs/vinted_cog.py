@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from discord.ext import commands
@@ -42,6 +43,14 @@ class VintedCog(Cog):
                 )
                 return
 
+        try:
+            # the catalog index may have to be downloaded, off the event loop
+            await asyncio.to_thread(self.bot_service.validate_watch_url, vintedurl)
+        except ValueError as e:
+            logger.info(f"Invalid watch url {vintedurl}: {e}")
+            await ctx.send(f"{ctx.author.mention} - **❌ Invalid url: {e}**")
+            return
+
         webhook = await ctx.channel.create_webhook(name="Vinted Bot Watch")
         webhook_url = str(webhook.url)
 
@@ -62,6 +71,13 @@ class VintedCog(Cog):
         Changes the url of an existing webhook
         Usage: `watch_update [new_url]`
         """
+        try:
+            await asyncio.to_thread(self.bot_service.validate_watch_url, new_url)
+        except ValueError as e:
+            logger.info(f"Invalid watch url {new_url}: {e}")
+            await ctx.send(f"{ctx.author.mention} - **❌ Invalid url: {e}**")
+            return
+
         for weburl in self.bot_config["watch"]:
             if self.bot_config["watch"][weburl]["channel"] == ctx.channel.name:
                 watch = self.bot_config["watch"]
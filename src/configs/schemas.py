@@ -1,4 +1,6 @@
-from schema import Or, Schema, SchemaError
+from schema import And, Optional, Or, Schema, SchemaError
+
+import src.defaults as defaults
 
 
 def _validate_log_levels(value):
@@ -49,6 +51,15 @@ def _validate_watch(value):
     return True
 
 
+def _validate_database_backend(value):
+    if value.get("backend", defaults.default_backend) != "mongo":
+        return True
+    for key in ("connection_string", "db_name"):
+        if key not in value:
+            raise SchemaError(f"Missing {key}, required with the mongo backend")
+    return True
+
+
 app_config_schema = Schema({"log_level": _validate_log_levels, "logs_directory": str})
 
 bot_config_schema = Schema(
@@ -68,14 +79,77 @@ scraper_config_schema = Schema(
         "logs_directory": str,
         "request_interval": int,
         "recheck_interval": int,
+        Optional("max_concurrent_requests"): int,
+        Optional("pool_maxsize"): int,
+        Optional("request_timeout"): Or(int, float),
+        Optional("min_request_rate"): Or(int, float),
+        Optional("max_request_rate"): Or(int, float),
+        Optional("request_rate_increase"): Or(int, float),
+        Optional("request_burst"): int,
+        Optional("incremental_polling"): bool,
+        Optional("max_incremental_pages"): int,
+        Optional("catalogs_cache_path"): str,
+        Optional("catalogs_cache_ttl"): int,
+        Optional("cookies_path"): str,
+        Optional("cookies_ttl"): int,
+        Optional("max_attempts"): int,
+        Optional("retry_base_delay"): Or(int, float),
+        Optional("retry_max_delay"): Or(int, float),
+        Optional("circuit_failure_threshold"): int,
+        Optional("circuit_reset_timeout"): int,
+        Optional("detail_cache_size"): int,
+        Optional("detail_cache_path"): str,
+        Optional("item_cache_ttl"): int,
+        Optional("user_cache_ttl"): int,
+        Optional("identities"): [
+            {
+                Optional("name"): str,
+                Optional("proxy"): str,
+                Optional("user_agent"): str,
+            }
+        ],
+        Optional("identity_cooldown"): int,
+        Optional("vinted_url"): str,
+        Optional("record_directory"): str,
+        Optional("prefetch_pages"): int,
+        Optional("scheduler_workers"): int,
+        Optional("watch_workers"): int,
+        Optional("min_recheck_interval"): int,
+        Optional("max_recheck_interval"): int,
+        Optional("recent_items_ttl"): int,
+        Optional("pipeline_workers"): {
+            Optional("list"): int,
+            Optional("detail"): int,
+            Optional("persist"): int,
+            Optional("filter"): int,
+            Optional("notify"): int,
+        },
+        Optional("pipeline_queue_size"): int,
+        Optional("cursor_ttl"): int,
+        Optional("cursor_max_drift"): Or(int, float),
+        Optional("sharding"): bool,
+        Optional("lease_ttl"): int,
+        Optional("random_scrape_exploration"): Or(int, float),
+        Optional("max_duplicate_pages"): int,
     }
 )
 
 database_config_schema = Schema(
-    {
-        "log_level": _validate_log_levels,
-        "logs_directory": str,
-        "connection_string": str,
-        "db_name": str,
-    }
+    And(
+        {
+            "log_level": _validate_log_levels,
+            "logs_directory": str,
+            Optional("backend"): Or("mongo", "sqlite"),
+            Optional("connection_string"): str,
+            Optional("db_name"): str,
+            Optional("sqlite_path"): str,
+            Optional("write_batch_size"): int,
+            Optional("write_flush_interval"): Or(int, float),
+            Optional("write_queue_size"): int,
+            Optional("write_drain_timeout"): Or(int, float),
+            Optional("seen_ids"): bool,
+            Optional("epoch_check_interval"): Or(int, float),
+        },
+        _validate_database_backend,
+    )
 )
@@ -1,38 +1,83 @@
 import logging
+import threading
+import time
 from collections import namedtuple
 
-import pymongo
+import src.defaults as defaults
+import src.utils as utils
+from src.exceptions import DuplicateKeyException, StorageException
+from src.seen_ids import SeenIds
+from src.storage import create_backend
 
 logger = logging.getLogger("database")
 
 
-Collection = namedtuple("Collection", ["unique_key", "db_collection"])
+Collection = namedtuple("Collection", ["unique_key", "name"])
 
 
 class Database:
-    def __init__(self, config, save_to_db=True):
+    def __init__(self, config, save_to_db=True, on_write_error=None):
         self._config = config
         self._save_to_db = save_to_db
-        self._client = pymongo.MongoClient(self._config["connection_string"])
+        self._on_write_error = on_write_error
+        self._backend = create_backend(config)
+        self.items = Collection("id", "items")
+        self.users = Collection("id", "users")
+        self.watches = Collection("key", "watches")
+        self.cursors = Collection("key", "cursors")
+        self.instances = Collection("key", "instances")
+        self.leases = Collection("key", "leases")
+        self.meta = Collection("key", "meta")
 
-        self._check_connection()
+        self._create_indexes()
 
-        logger.info("Using database: %s", self._config["db_name"])
-        self._db = self._client[self._config["db_name"]]
-        self.items = Collection("id", self._db.items)
-        self.users = Collection("id", self._db.users)
+        self._write_batch_size = utils.get_config_value(
+            config, "write_batch_size", defaults.default_write_batch_size
+        )
+        self._write_flush_interval = utils.get_config_value(
+            config, "write_flush_interval", defaults.default_write_flush_interval
+        )
+        self._write_queue_size = utils.get_config_value(
+            config, "write_queue_size", defaults.default_write_queue_size
+        )
+        self._write_drain_timeout = utils.get_config_value(
+            config, "write_drain_timeout", defaults.default_write_drain_timeout
+        )
+        self._write_buffer = {}
+        # documents being flushed, still known to get_no_dupes until they're in the database
+        self._flushing = {}
+        self._write_lock = threading.Lock()
+        self._write_condition = threading.Condition(self._write_lock)
+        self._flush_lock = threading.Lock()
+        self._writer_thread = None
+        self._write_failing = False
+        self._closing = False
 
-    def _check_connection(self):
-        logger.info("Checking connection to the database")
-        try:
-            self._client.server_info()
-        except pymongo.errors.ServerSelectionTimeoutError:
-            logger.error("Couldn't connect to the database")
-            raise ConnectionError
-        except pymongo.errors.OperationFailure:
-            logger.error("Couldn't authenticate to the database")
-            raise ConnectionError
-        logger.info("Successfully connected to the database")
+        self._seen_ids = SeenIds() if utils.get_config_value(config, "seen_ids", defaults.default_seen_ids) else None
+        self._epoch_check_interval = utils.get_config_value(
+            config, "epoch_check_interval", defaults.default_epoch_check_interval
+        )
+        self._epoch = None
+        self._epoch_checked_at = 0
+        self._epoch_lock = threading.Lock()
+        self._seen_ids_loader = None
+        self._seen_ids_loader_lock = threading.Lock()
+
+    def _create_indexes(self):
+        # a lease upserted by two instances at once must also fail for one of them
+        for collection in (
+            self.items, self.users, self.watches, self.cursors, self.instances, self.leases, self.meta
+        ):
+            try:
+                self._backend.create_index(collection)
+            except StorageException as e:
+                logger.warning(
+                    "Couldn't create a unique index on %s.%s, falling back to a non unique one: %s",
+                    collection.name,
+                    collection.unique_key,
+                    e,
+                )
+                self._backend.create_index(collection, unique=False)
 
     def insert(self, data, collection):
         if not self._save_to_db:
@@ -45,29 +90,227 @@ class Database:
         else:
             logger.debug("Document doesn't exist in the database")
             logger.debug("Inserting document")
-            collection[1].insert_one(data)
+            try:
+                self._backend.insert_one(collection, data)
+            except DuplicateKeyException:
+                logger.debug("Document inserted concurrently, updating it")
+                self.update(data, collection)
+        if self._is_items(collection):
+            self._seen_ids.add(data[collection.unique_key])
 
     def exists(self, data, collection: Collection):
         logger.debug(f"Checking if document exists in the database: {data}")
-        return collection.db_collection.find_one({collection.unique_key: data[collection.unique_key]})
+        return self._backend.find_one(collection, data[collection.unique_key])
 
     def update(self, data, collection):
         if not self._save_to_db:
             return
         logger.debug(f"Updating document in the database: {data}")
-        collection.db_collection.update_one(
-            {collection.unique_key: data[collection.unique_key]}, {"$set": data}, upsert=True
-        )
+        self._backend.update_one(collection, data[collection.unique_key], data)
+
+    def upsert(self, data, collection):
+        if not self._save_to_db:
+            return
+        logger.debug(f"Buffering document: {data}")
+        key = data[collection.unique_key]
+        with self._write_condition:
+            # started again if a failure ended it
+            if not self._writer_thread or not self._writer_thread.is_alive():
+                self._writer_thread = threading.Thread(target=self._write_behind, name="writer", daemon=True)
+                self._writer_thread.start()
+            # a full buffer blocks the callers until the writer catches up, merging into a buffered document doesn't
+            self._write_condition.wait_for(
+                lambda: self._get_buffered_count() < self._write_queue_size
+                or key in self._write_buffer.get(collection.name, (None, {}))[1]
+            )
+            _, documents = self._write_buffer.setdefault(collection.name, (collection, {}))
+            documents[key] = {**documents.get(key, {}), **data}
+            if self._get_buffered_count() >= self._write_batch_size:
+                self._write_condition.notify_all()
+
+    def flush(self):
+        written = True
+        with self._flush_lock:
+            with self._write_lock:
+                self._flushing, self._write_buffer = self._write_buffer, {}
+            for collection, documents in self._flushing.values():
+                logger.debug("Writing %d documents to %s", len(documents), collection.name)
+                try:
+                    self._backend.upsert_many(collection, documents)
+                except StorageException as e:
+                    logger.error(
+                        "Couldn't write %d documents to %s, retrying on next flush: %s",
+                        len(documents),
+                        collection.name,
+                        e,
+                    )
+                    self._requeue(collection, documents)
+                    if not self._write_failing and self._on_write_error:
+                        # reported once until the writes go through again
+                        try:
+                            self._on_write_error(e)
+                        except Exception as on_write_error_e:
+                            logger.error("Couldn't report the write error: %s", on_write_error_e)
+                    self._write_failing = True
+                    written = False
+                    continue
+                if self._is_items(collection):
+                    for key in documents:
+                        self._seen_ids.add(key)
+            with self._write_condition:
+                self._flushing = {}
+                self._write_condition.notify_all()
+            if written and self._write_failing:
+                logger.info("Writes to the database are going through again")
+                self._write_failing = False
+        return written
+
+    def close(self):
+        logger.info("Writing buffered documents")
+        with self._write_condition:
+            self._closing = True
+            self._write_condition.notify_all()
+            writer_thread = self._writer_thread
+        if writer_thread:
+            writer_thread.join(self._write_drain_timeout)
+        else:
+            self.flush()
+        with self._write_lock:
+            lost = self._get_buffered_count()
+        if lost:
+            logger.error("Couldn't write %d buffered documents before shutting down", lost)
+
+    def _requeue(self, collection, documents):
+        with self._write_lock:
+            _, buffered_documents = self._write_buffer.setdefault(collection.name, (collection, {}))
+            for key, document in documents.items():
+                buffered_documents[key] = {**document, **buffered_documents.get(key, {})}
+
+    def _write_behind(self):
+        while True:
+            with self._write_condition:
+                self._write_condition.wait_for(
+                    lambda: self._closing or self._get_buffered_count() >= self._write_batch_size,
+                    timeout=self._write_flush_interval,
+                )
+                closing = self._closing
+            written = self.flush()
+            with self._write_lock:
+                if closing and not self._get_buffered_count():
+                    return
+            if not written:
+                time.sleep(self._write_flush_interval)
+
+    def _get_buffered_count(self):
+        return sum(len(documents) for _, documents in self._write_buffer.values())
+
+    def _get_buffered_keys(self, collection):
+        with self._write_lock:
+            return {
+                key
+                for write_buffer in (self._write_buffer, self._flushing)
+                if collection.name in write_buffer
+                for key in write_buffer[collection.name][1]
+            }
+
+    def _is_items(self, collection):
+        return self._seen_ids is not None and collection.name == self.items.name
+
+    def _start_seen_ids_loader(self):
+        # only processes deduping items load them, not the ones merely reading or resetting the database
+        with self._seen_ids_loader_lock:
+            if self._seen_ids_loader is None:
+                self._seen_ids_loader = threading.Thread(target=self._load_seen_ids, name="seen-ids", daemon=True)
+                self._seen_ids_loader.start()
+
+    def _load_seen_ids(self):
+        logger.info("Loading seen item ids")
+        try:
+            self._check_epoch(force=True)
+            for key in self._backend.iter_keys(self.items):
+                self._seen_ids.add(key)
+        except StorageException as e:
+            # ids missing from the set are looked up in the database anyway
+            logger.error("Couldn't load seen item ids: %s", e)
+            return
+        logger.info("Loaded %d seen item ids", len(self._seen_ids))
+
+    def _check_epoch(self, force=False):
+        # another process resetting the database bumps the epoch, every seen id is then forgotten
+        with self._epoch_lock:
+            if not force and time.time() - self._epoch_checked_at < self._epoch_check_interval:
+                return
+            self._epoch_checked_at = time.time()
+            document = self._backend.find_one(self.meta, "epoch")
+            epoch = document["epoch"] if document else 0
+            if self._epoch is not None and epoch != self._epoch:
+                logger.info("Database was reset, forgetting seen item ids")
+                self._seen_ids.clear()
+            self._epoch = epoch
 
     def reset(self):
         logger.debug("Resetting database")
-        self.items.db_collection.drop()
-        self.users.db_collection.drop()
+        with self._write_lock:
+            self._write_buffer = {}
+        self._backend.drop(self.items)
+        self._backend.drop(self.users)
+        self._create_indexes()
+        self._backend.increment(self.meta, "epoch", "epoch")
+        if self._seen_ids is not None:
+            self._check_epoch(force=True)
 
     def get_no_dupes(self, collection, ids):
-        no_dupes = []
-        for id in ids:
-            db_item = collection.db_collection.find_one({"id": id})
-            if not db_item:
-                no_dupes.append(id)
-        return no_dupes
+        buffered_keys = self._get_buffered_keys(collection)
+        ids = [id for id in ids if id not in buffered_keys]
+        if self._is_items(collection):
+            self._start_seen_ids_loader()
+            self._check_epoch()
+            # only ids this process hasn't seen can be new, other processes' inserts are found in the database
+            ids = [id for id in ids if id not in self._seen_ids]
+        if not ids:
+            return []
+        dupes = self._backend.find_keys(collection, ids)
+        if self._is_items(collection):
+            for dupe in dupes:
+                self._seen_ids.add(dupe)
+        return [id for id in ids if id not in dupes]
+
+    def get_high_water_mark(self, key):
+        watch = self._backend.find_one(self.watches, key)
+        return watch["high_water_mark"] if watch else None
+
+    def set_high_water_mark(self, key, item_id):
+        logger.debug(f"Setting high water mark of {key} to {item_id}")
+        self._backend.set_max(self.watches, key, "high_water_mark", item_id)
+
+    def get_cursor(self, key):
+        return self._backend.find_one(self.cursors, key)
+
+    def set_cursor(self, key, url, page, last_id, total_entries):
+        logger.debug(f"Setting cursor of {key} to page {page}")
+        self._backend.update_one(
+            self.cursors,
+            key,
+            {
+                "url": url,
+                "page": page,
+                "last_id": last_id,
+                "total_entries": total_entries,
+                "updated_at": time.time(),
+            },
+        )
+
+    def heartbeat_instance(self, instance_id, ttl):
+        self._backend.update_one(self.instances, instance_id, {"expires_at": time.time() + ttl})
+
+    def get_live_instances(self):
+        instances = self._backend.find_greater(self.instances, "expires_at", time.time())
+        return sorted(instance[self.instances.unique_key] for instance in instances)
+
+    def acquire_lease(self, key, owner, ttl):
+        now = time.time()
+        return self._backend.acquire_lease(self.leases, key, owner, now + ttl, now)
+
+    def release_lease(self, key, owner):
+        logger.debug(f"Releasing lease of {key}")
+        self._backend.release_lease(self.leases, key, owner)
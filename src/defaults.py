@@ -1,2 +1,46 @@
 default_log_level = "INFO"
 default_logs_directory = "./logs"
+default_max_concurrent_requests = 4
+default_pool_maxsize = 10
+default_request_timeout = 30
+default_min_request_rate = 0.1
+default_max_request_rate = 5
+default_request_rate_increase = 0.1
+default_request_burst = 4
+default_incremental_polling = False
+default_max_incremental_pages = 5
+default_catalogs_cache_path = "./cache/catalogs.json"
+default_catalogs_cache_ttl = 60 * 60 * 24
+default_cookies_path = "./cache/cookies.json"
+default_cookies_ttl = 60 * 60
+default_max_attempts = 5
+default_retry_base_delay = 1
+default_retry_max_delay = 60
+default_circuit_failure_threshold = 5
+default_circuit_reset_timeout = 60
+default_detail_cache_size = 10000
+default_item_cache_ttl = 60 * 5
+default_user_cache_ttl = 60 * 60
+default_user_agent = "Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/117.0"
+default_identity_cooldown = 10
+default_vinted_url = "https://www.vinted.fr"
+default_prefetch_pages = 2
+default_scheduler_workers = 4
+default_pipeline_workers = {"list": 1, "detail": 4, "persist": 1, "filter": 1, "notify": 1}
+default_pipeline_queue_size = 100
+default_cursor_ttl = 86400
+default_recent_items_ttl = 86400
+default_cursor_max_drift = 0.1
+default_sharding = False
+default_lease_ttl = 60
+default_random_scrape_exploration = 0.1
+default_max_duplicate_pages = 2
+default_watch_workers = 4
+default_write_batch_size = 100
+default_write_flush_interval = 1
+default_seen_ids = True
+default_epoch_check_interval = 10
+default_write_queue_size = 1000
+default_write_drain_timeout = 5
+default_backend = "mongo"
+default_sqlite_path = "./data/vinted.sqlite"
@@ -4,3 +4,15 @@ class AuthenticationError(Exception):
 
 class RetryException(Exception):
     pass
+
+
+class CircuitOpenException(Exception):
+    pass
+
+
+class StorageException(Exception):
+    pass
+
+
+class DuplicateKeyException(StorageException):
+    pass
@@ -0,0 +1,122 @@
+import http.cookiejar
+import json
+import logging
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import src.defaults as defaults
+import src.utils as utils
+
+logger = logging.getLogger("scraper")
+
+
+def create_http_client(config):
+    http_client = HttpClient(config)
+    if "record_directory" in config:
+        http_client = RecordingHttpClient(http_client, config["record_directory"])
+    return http_client
+
+
+class HttpClient:
+    def __init__(self, config):
+        self._pool_maxsize = utils.get_config_value(
+            config, "pool_maxsize", defaults.default_pool_maxsize
+        )
+        self._timeout = utils.get_config_value(
+            config, "request_timeout", defaults.default_request_timeout
+        )
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self._timeout)
+        return self._get_session(url).request(method, url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def _get_session(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._sessions:
+                self._sessions[host] = self._create_session()
+            return self._sessions[host]
+
+    def _create_session(self):
+        session = requests.Session()
+        # cookies are sent explicitly by the callers, the session must not replay the ones it receives
+        session.cookies.set_policy(
+            http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+class RecordingHttpClient:
+    ITEM_PATH = re.compile(r"^/api/v2/items/(\d+)$")
+    USER_PATH = re.compile(r"^/api/v2/users/(\d+)$")
+
+    def __init__(self, http_client, record_directory):
+        self._http_client = http_client
+        self._record_directory = record_directory
+        for fixtures_dir in ["catalog", "items", "users"]:
+            os.makedirs(os.path.join(record_directory, fixtures_dir), exist_ok=True)
+
+    def get(self, url, **kwargs):
+        response = self._http_client.get(url, **kwargs)
+        self._record(url, response)
+        return response
+
+    def post(self, url, **kwargs):
+        return self._http_client.post(url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        return self._http_client.request(method, url, **kwargs)
+
+    def close(self):
+        self._http_client.close()
+
+    def _record(self, url, response):
+        path = urlparse(url).path
+        if not path.startswith("/api/v2/"):
+            return
+        try:
+            json_response = response.json()
+        except ValueError:
+            return
+        if json_response.get("code") != 0:
+            return
+
+        item_match = self.ITEM_PATH.match(path)
+        user_match = self.USER_PATH.match(path)
+        if path == "/api/v2/catalog/items":
+            # catalog entries are stored one by one, the fake server paginates them itself
+            for item in json_response["items"]:
+                self._write(os.path.join("catalog", f"{item['id']}.json"), item)
+        elif item_match:
+            self._write(os.path.join("items", f"{item_match.group(1)}.json"), json_response)
+        elif user_match:
+            self._write(os.path.join("users", f"{user_match.group(1)}.json"), json_response)
+        elif path == "/api/v2/catalogs":
+            self._write("catalogs.json", json_response)
+
+    def _write(self, fixture_path, data):
+        logger.debug(f"Recording {fixture_path}")
+        with open(os.path.join(self._record_directory, fixture_path), "w") as fixture_file:
+            json.dump(data, fixture_file)
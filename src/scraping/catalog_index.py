@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import src.defaults as defaults
+import src.utils as utils
+
+logger = logging.getLogger("scraper")
+
+
+class CatalogIndex:
+    def __init__(self, config, fetch_catalogs):
+        self._path = utils.get_config_value(
+            config, "catalogs_cache_path", defaults.default_catalogs_cache_path
+        )
+        self._ttl = utils.get_config_value(
+            config, "catalogs_cache_ttl", defaults.default_catalogs_cache_ttl
+        )
+        self._fetch_catalogs = fetch_catalogs
+        self._parents = {}
+        self._children = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def ids(self):
+        self._ensure_loaded()
+        return list(self._parents)
+
+    def __contains__(self, catalog_id):
+        self._ensure_loaded()
+        return catalog_id in self._parents
+
+    def get_path(self, catalog_id):
+        self._ensure_loaded()
+        path = []
+        while catalog_id is not None:
+            path.append(catalog_id)
+            catalog_id = self._parents[catalog_id]
+        return path[::-1]
+
+    def get_descendants(self, catalog_id):
+        self._ensure_loaded()
+        descendants = []
+        stack = list(self._children.get(catalog_id, []))
+        while stack:
+            child_id = stack.pop()
+            descendants.append(child_id)
+            stack.extend(self._children.get(child_id, []))
+        return descendants
+
+    def refresh(self):
+        logger.info("Refreshing catalogs")
+        catalogs = self._fetch_catalogs()
+        parents = {}
+        stack = [(catalog, None) for catalog in catalogs]
+        while stack:
+            catalog, parent_id = stack.pop()
+            parents[catalog["id"]] = parent_id
+            stack.extend((child, catalog["id"]) for child in catalog["catalogs"])
+        with self._lock:
+            self._set_parents(parents, time.time())
+        self._save()
+
+    def start_refresh_thread(self):
+        refresh_thread = threading.Thread(target=self._periodic_refresh, daemon=True)
+        refresh_thread.start()
+
+    def _periodic_refresh(self):
+        while True:
+            try:
+                self._ensure_loaded()
+                threading.Event().wait(max(self._fetched_at + self._ttl - time.time(), 0))
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error while refreshing catalogs: {e}")
+                threading.Event().wait(60)
+
+    def _ensure_loaded(self):
+        with self._load_lock:
+            if self._fetched_at is None:
+                self._load()
+            if self._fetched_at is not None and time.time() - self._fetched_at <= self._ttl:
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                # stale catalogs are still better than none
+                if self._fetched_at is None:
+                    raise
+                logger.warning(f"Couldn't refresh catalogs, using cached ones: {e}")
+
+    def _set_parents(self, parents, fetched_at):
+        children = {}
+        for catalog_id, parent_id in parents.items():
+            children.setdefault(parent_id, []).append(catalog_id)
+        self._parents = parents
+        self._children = children
+        self._fetched_at = fetched_at
+
+    def _load(self):
+        if not os.path.isfile(self._path):
+            return
+        logger.debug(f"Loading catalogs from {self._path}")
+        with open(self._path, "r") as cache_file:
+            cache = json.load(cache_file)
+        parents = {
+            int(catalog_id): parent_id for catalog_id, parent_id in cache["parents"].items()
+        }
+        self._set_parents(parents, cache["fetched_at"])
+
+    def _save(self):
+        cache_dir = os.path.dirname(self._path)
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        with open(f"{self._path}.tmp", "w") as cache_file:
+            json.dump({"fetched_at": self._fetched_at, "parents": self._parents}, cache_file)
+        os.replace(f"{self._path}.tmp", self._path)
@@ -0,0 +1,34 @@
+import logging
+import random
+import threading
+
+logger = logging.getLogger("scraper")
+
+
+class CategorySampler:
+    def __init__(self, exploration, smoothing=0.3):
+        self._exploration = exploration
+        self._smoothing = smoothing
+        self._yields = {}
+        self._lock = threading.Lock()
+
+    def sample(self, catalog_ids):
+        if random.random() < self._exploration:
+            return random.choice(catalog_ids)
+
+        with self._lock:
+            # categories never scraped are expected to yield as much as the average one
+            prior = sum(self._yields.values()) / len(self._yields) if self._yields else 1
+            weights = [self._yields.get(catalog_id, prior) for catalog_id in catalog_ids]
+        if not any(weights):
+            return random.choice(catalog_ids)
+        return random.choices(catalog_ids, weights=weights)[0]
+
+    def record(self, catalog_id, new_items_count):
+        with self._lock:
+            if catalog_id in self._yields:
+                new_items_count = (
+                    self._smoothing * new_items_count + (1 - self._smoothing) * self._yields[catalog_id]
+                )
+            self._yields[catalog_id] = new_items_count
+        logger.debug(f"Catalog {catalog_id} yields {new_items_count:.1f} new items per page")
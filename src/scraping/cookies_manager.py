@@ -1,32 +1,83 @@
-import requests
-import threading
+import json
 import logging
+import os
+import threading
+import time
+
+import src.defaults as defaults
+import src.utils as utils
 
 logger = logging.getLogger("scraper")
 
 
 class CookiesManager:
 
-    def __init__(self, headers):
+    def __init__(self, config, headers, http_client, rate_limiter, proxies=None, name=None):
+        self._path = utils.get_config_value(
+            config, "cookies_path", defaults.default_cookies_path
+        )
+        if name:
+            path_root, path_ext = os.path.splitext(self._path)
+            self._path = f"{path_root}.{name}{path_ext}"
+        self._ttl = utils.get_config_value(
+            config, "cookies_ttl", defaults.default_cookies_ttl
+        )
+        self._vinted_url = utils.get_config_value(
+            config, "vinted_url", defaults.default_vinted_url
+        )
         self._headers = headers
-        self.renew_cookies()
-        self._start_cookie_renewal_thread()
+        self._http_client = http_client
+        self._rate_limiter = rate_limiter
+        self._proxies = proxies
+        self._cookies = None
+        self._expires_at = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_cookies(self):
+        with self._lock:
+            if self._cookies is None:
+                self._load()
+            if self._cookies is None or time.time() >= self._expires_at:
+                self._renew()
+            return self._cookies, self._generation
+
+    def renew_cookies(self, generation):
+        with self._lock:
+            # someone already renewed the cookies the caller was using
+            if generation != self._generation:
+                return
+            self._renew()
 
-    def renew_cookies(self):
+    def _renew(self):
         logger.info("Renewing cookies")
-        response = requests.get("https://www.vinted.fr", headers=self._headers)
-        cookies = "; ".join(
+        self._rate_limiter.acquire()
+        response = self._http_client.get(
+            self._vinted_url, headers=self._headers, proxies=self._proxies
+        )
+        self._cookies = "; ".join(
             [f"{cookie.name}={cookie.value}" for cookie in response.cookies]
         )
-        self._headers["Cookie"] = cookies
+        expires = [cookie.expires for cookie in response.cookies if cookie.expires]
+        self._expires_at = min([time.time() + self._ttl, *expires])
+        self._generation += 1
+        self._save()
 
-    def _start_cookie_renewal_thread(self):
-        renewal_thread = threading.Thread(
-            target=self._periodic_cookie_renewal, daemon=True
-        )
-        renewal_thread.start()
+    def _load(self):
+        if not os.path.isfile(self._path):
+            return
+        with open(self._path, "r") as cookies_file:
+            saved_cookies = json.load(cookies_file)
+        if time.time() >= saved_cookies["expires_at"]:
+            return
+        logger.debug(f"Using cookies from {self._path}")
+        self._cookies = saved_cookies["cookies"]
+        self._expires_at = saved_cookies["expires_at"]
 
-    def _periodic_cookie_renewal(self):
-        while True:
-            threading.Event().wait(60 * 10)  # 10 minutes
-            self.renew_cookies()
+    def _save(self):
+        cookies_dir = os.path.dirname(self._path)
+        if cookies_dir and not os.path.isdir(cookies_dir):
+            os.makedirs(cookies_dir)
+        with open(f"{self._path}.tmp", "w") as cookies_file:
+            json.dump({"cookies": self._cookies, "expires_at": self._expires_at}, cookies_file)
+        os.replace(f"{self._path}.tmp", self._path)
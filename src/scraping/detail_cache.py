@@ -0,0 +1,104 @@
+import copy
+import logging
+import os
+import shelve
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger("scraper")
+
+
+class DetailCache:
+    def __init__(self, name, max_size, ttl, path=None):
+        self._name = name
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._disk = None
+        if path:
+            cache_dir = os.path.dirname(path)
+            if cache_dir and not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            self._disk = shelve.open(f"{path}.{name}")
+            self._prune_disk()
+
+    def get_or_fetch(self, key, fetch):
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                return copy.deepcopy(value)
+            future = self._in_flight.get(key)
+            is_fetching = future is None
+            if is_fetching:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not is_fetching:
+            logger.debug(f"Waiting for in-flight {self._name} {key}")
+            return copy.deepcopy(future.result())
+
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(key)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._set(key, value)
+            self._in_flight.pop(key)
+        future.set_result(value)
+        return copy.deepcopy(value)
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, copy.deepcopy(value))
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None and self._disk is not None:
+            entry = self._disk.get(str(key))
+            if entry is not None:
+                self._entries[key] = entry
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if time.time() >= expires_at:
+            self._delete(key)
+            return None
+        self._entries.move_to_end(key)
+        logger.debug(f"Cache hit for {self._name} {key}")
+        return value
+
+    def _set(self, key, value):
+        entry = (time.time() + self._ttl, value)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if self._disk is not None:
+            self._disk[str(key)] = entry
+        while len(self._entries) > self._max_size:
+            # evicted entries stay available on disk until they expire
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        now = time.time()
+        expired_keys = [key for key, (expires_at, _) in self._disk.items() if now >= expires_at]
+        for key in expired_keys:
+            del self._disk[key]
+        logger.debug(f"Pruned {len(expired_keys)} expired {self._name} from disk")
+
+    def _delete(self, key):
+        self._entries.pop(key, None)
+        if self._disk is not None:
+            self._disk.pop(str(key), None)
@@ -0,0 +1,138 @@
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.scraping.vinted_codes import VintedCodes
+
+logger = logging.getLogger("scraper")
+
+
+class FakeVintedServer:
+    ITEM_PATH = re.compile(r"^/api/v2/items/(\d+)$")
+    USER_PATH = re.compile(r"^/api/v2/users/(\d+)$")
+
+    def __init__(self, fixtures_directory, host="127.0.0.1", port=8080, latency=0,
+                 per_page=96, error_rate=0, error_codes=None):
+        self.latency = latency
+        self.per_page = per_page
+        self.error_rate = error_rate
+        self.error_codes = error_codes or [code.value for code in VintedCodes]
+        self._load_fixtures(fixtures_directory)
+
+        handler = type("FakeVintedHandler", (_FakeVintedHandler,), {"fake_vinted": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        logger.info(f"Serving fake Vinted on {self.url}")
+        self._server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _load_fixtures(self, fixtures_directory):
+        catalog_directory = os.path.join(fixtures_directory, "catalog")
+        self.catalog_items = sorted(
+            self._load_directory(catalog_directory).values(), key=lambda item: item["id"], reverse=True
+        )
+        self.items = self._load_directory(os.path.join(fixtures_directory, "items"))
+        self.users = self._load_directory(os.path.join(fixtures_directory, "users"))
+        catalogs_path = os.path.join(fixtures_directory, "catalogs.json")
+        self.catalogs = self._load_file(catalogs_path) if os.path.isfile(catalogs_path) else {"catalogs": [], "code": 0}
+        logger.info(
+            f"Loaded {len(self.catalog_items)} catalog entries, {len(self.items)} items and {len(self.users)} users"
+        )
+
+    def _load_directory(self, directory):
+        if not os.path.isdir(directory):
+            return {}
+        return {
+            int(os.path.splitext(file_name)[0]): self._load_file(os.path.join(directory, file_name))
+            for file_name in os.listdir(directory)
+            if file_name.endswith(".json")
+        }
+
+    def _load_file(self, path):
+        with open(path, "r") as fixture_file:
+            return json.load(fixture_file)
+
+    def get_response(self, path, query):
+        if self.latency:
+            time.sleep(self.latency)
+        if path.startswith("/api/v2/") and random.random() < self.error_rate:
+            return {"code": random.choice(self.error_codes), "message": "Injected error"}
+
+        item_match = self.ITEM_PATH.match(path)
+        user_match = self.USER_PATH.match(path)
+        if path == "/api/v2/catalog/items":
+            return self._get_catalog_page(query)
+        if item_match:
+            return self.items.get(int(item_match.group(1)), self._not_found())
+        if user_match:
+            return self.users.get(int(user_match.group(1)), self._not_found())
+        if path == "/api/v2/catalogs":
+            return self.catalogs
+        return None
+
+    def _get_catalog_page(self, query):
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("per_page", [self.per_page])[0])
+        total_pages = max(math.ceil(len(self.catalog_items) / per_page), 1)
+        return {
+            "code": 0,
+            "items": self.catalog_items[(page - 1) * per_page:page * per_page],
+            "pagination": {
+                "current_page": page,
+                "total_pages": total_pages,
+                "total_entries": len(self.catalog_items),
+                "per_page": per_page,
+            },
+        }
+
+    def _not_found(self):
+        return {"code": VintedCodes.NOT_FOUND.value, "message": "Not found"}
+
+
+class _FakeVintedHandler(BaseHTTPRequestHandler):
+    fake_vinted = None
+
+    def do_GET(self):
+        parsed_url = urlparse(self.path)
+        if not parsed_url.path.startswith("/api/"):
+            # the home page only hands out session cookies
+            self.send_response(200)
+            self.send_header("Set-Cookie", f"_vinted_fr_session=fake-{random.getrandbits(32)}; Path=/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        json_response = self.fake_vinted.get_response(parsed_url.path, parse_qs(parsed_url.query))
+        if json_response is None:
+            self.send_error(404)
+            return
+        body = json.dumps(json_response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
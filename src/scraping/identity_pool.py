@@ -0,0 +1,41 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger("scraper")
+
+
+class Identity:
+    def __init__(self, name, headers, proxies, cookies_manager, rate_limiter):
+        self.name = name
+        self.headers = headers
+        self.proxies = proxies
+        self.cookies_manager = cookies_manager
+        self.rate_limiter = rate_limiter
+        self.cooldown_until = 0
+
+
+class IdentityPool:
+    def __init__(self, identities, cooldown):
+        self._identities = identities
+        self._cooldown = cooldown
+        self._next_index = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                for _ in range(len(self._identities)):
+                    identity = self._identities[self._next_index]
+                    self._next_index = (self._next_index + 1) % len(self._identities)
+                    if identity.cooldown_until <= now:
+                        return identity
+                wait = min(identity.cooldown_until for identity in self._identities) - now
+            logger.debug(f"Every identity is rate limited, waiting {wait:.1f}s")
+            time.sleep(wait)
+
+    def on_rate_limit(self, identity):
+        with self._lock:
+            identity.cooldown_until = time.time() + self._cooldown
+        logger.warning(f"Identity {identity.name} rate limited, out of rotation for {self._cooldown}s")
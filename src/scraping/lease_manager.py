@@ -0,0 +1,78 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("scraper")
+
+
+class LeaseManager:
+    def __init__(self, database, lease_ttl):
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._database = database
+        self._lease_ttl = lease_ttl
+        self._keys = {}
+        self._owned = set()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        logger.info(f"Sharding watches as instance {self.instance_id}")
+        self._thread = threading.Thread(target=self._renew_leases, name="leases", daemon=True)
+        self._thread.start()
+
+    def update_keys(self, group, keys):
+        keys = {f"{group}:{key}" for key in keys}
+        with self._lock:
+            changed = self._keys.get(group) != keys
+            self._keys[group] = keys
+        # new keys are leased right away instead of waiting for the next renewal
+        if changed:
+            self.sync()
+
+    def owns(self, group, key):
+        with self._lock:
+            return f"{group}:{key}" in self._owned
+
+    def sync(self):
+        with self._sync_lock:
+            self._database.heartbeat_instance(self.instance_id, self._lease_ttl)
+            instances = self._database.get_live_instances()
+            with self._lock:
+                keys = set().union(*self._keys.values())
+                previously_owned = set(self._owned)
+
+            owned = set()
+            for key in keys:
+                if self._get_owner(key, instances) != self.instance_id:
+                    continue
+                if self._database.acquire_lease(key, self.instance_id, self._lease_ttl):
+                    owned.add(key)
+            # released leases are picked up by their new owner without waiting for them to expire
+            for key in previously_owned - owned:
+                self._database.release_lease(key, self.instance_id)
+
+            with self._lock:
+                self._owned = owned
+            if owned != previously_owned:
+                logger.info(f"Holding {len(owned)}/{len(keys)} leases across {len(instances)} instances")
+
+    def _get_owner(self, key, instances):
+        # rendezvous hashing, an instance joining or leaving only moves the keys it wins or held
+        if self.instance_id not in instances:
+            instances = [*instances, self.instance_id]
+        return max(instances, key=lambda instance: hashlib.sha1(f"{instance}:{key}".encode()).digest())
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self._lease_ttl / 3)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Error while renewing leases: {e}")
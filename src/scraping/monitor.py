@@ -1,186 +1,533 @@
+import concurrent.futures
+import functools
 import logging
 import time
 import threading
-import random
+from collections import deque
 
 import requests.exceptions
+import src.defaults as defaults
 import src.exceptions
-
+import src.utils as utils
+
+from src.scraping.catalog_index import CatalogIndex
+from src.scraping.category_sampler import CategorySampler
+from src.scraping.lease_manager import LeaseManager
+from src.scraping.pipeline import Pipeline, Stage
+from src.scraping.poll_intervals import PollIntervals
+from src.scraping.retry_policy import CircuitBreaker
+from src.scraping.scheduler import Scheduler
 from src.scraping.scraper import Scraper
 from src.scraping.query_generator import QueryGenerator
+from src.scraping.request_executor import RequestExecutor
+from src.scraping.recent_items import RecentItems
 
 logger = logging.getLogger("scraper")
 
+SCRAPE_EXCEPTIONS = (
+    requests.exceptions.RequestException,
+    src.exceptions.RetryException,
+    src.exceptions.CircuitOpenException,
+)
+
+BACKGROUND_SCRAPE_MONITOR_KEY = ("background_scrape_monitor",)
+BACKGROUND_SCRAPE_KEY = "background_scrape"
+RANDOM_SCRAPE_KEY = "random_scrape"
+WATCH_KEY = "watch"
+WATCH_LEASE_GROUP = "watch"
+
 
 class Monitor:
-    def __init__(self, config):
+    def __init__(self, config, http_client=None):
         self._config = config
-        self._scraper = Scraper(config)
+        self._scraper = Scraper(config, http_client, "monitor")
+        self._request_executor = RequestExecutor(
+            utils.get_config_value(
+                config, "max_concurrent_requests", defaults.default_max_concurrent_requests
+            ),
+        )
+        self._catalog_index = CatalogIndex(config, self._scraper.scrape_cats)
+        self._category_sampler = CategorySampler(
+            utils.get_config_value(config, "random_scrape_exploration", defaults.default_random_scrape_exploration)
+        )
+        self._max_duplicate_pages = utils.get_config_value(
+            config, "max_duplicate_pages", defaults.default_max_duplicate_pages
+        )
         self._query_generator = QueryGenerator()
-        self._threads = []
-        self._background_scrape_monitor_thread_started = False
+        self._incremental_polling = utils.get_config_value(
+            config, "incremental_polling", defaults.default_incremental_polling
+        )
+        self._max_incremental_pages = utils.get_config_value(
+            config, "max_incremental_pages", defaults.default_max_incremental_pages
+        )
+        self._prefetch_pages = utils.get_config_value(
+            config, "prefetch_pages", defaults.default_prefetch_pages
+        )
+        self._scheduler = Scheduler(
+            utils.get_config_value(config, "scheduler_workers", defaults.default_scheduler_workers),
+            config["recheck_interval"],
+        )
+        recheck_interval = config["recheck_interval"]
+        self._min_recheck_interval = utils.get_config_value(config, "min_recheck_interval", recheck_interval)
+        self._watch_scheduler = Scheduler(
+            utils.get_config_value(config, "watch_workers", defaults.default_watch_workers),
+            config["recheck_interval"],
+        )
+        self._watch_queries = {}
+        self._watch_cycle = {"polls": 0, "new_items": 0, "errors": 0}
+        self._watch_cycle_lock = threading.Lock()
+        self._poll_intervals = PollIntervals(
+            recheck_interval,
+            self._min_recheck_interval,
+            utils.get_config_value(config, "max_recheck_interval", recheck_interval),
+        )
+        self._recent_items = RecentItems(
+            utils.get_config_value(config, "recent_items_ttl", defaults.default_recent_items_ttl)
+        )
+        self._cursor_ttl = utils.get_config_value(config, "cursor_ttl", defaults.default_cursor_ttl)
+        self._cursor_max_drift = utils.get_config_value(config, "cursor_max_drift", defaults.default_cursor_max_drift)
+        self._pipeline = self._create_pipeline(config)
+        self._sharding = utils.get_config_value(config, "sharding", defaults.default_sharding)
+        self._lease_manager = None
+        self._lease_manager_lock = threading.Lock()
+        self._open_circuit_breakers = set()
+        self._background_scrape_monitor_started = False
+        self._stopped = threading.Event()
+
+    def stop(self):
+        # no poll or page is started anymore, the running ones finish on their own
+        self._stopped.set()
+        for scheduler in (self._scheduler, self._watch_scheduler):
+            for key in scheduler.keys():
+                scheduler.cancel(key)
+        self._scraper.close()
+
+    def _create_pipeline(self, config):
+        workers = {
+            **defaults.default_pipeline_workers,
+            **utils.get_config_value(config, "pipeline_workers", {}),
+        }
+        queue_size = utils.get_config_value(config, "pipeline_queue_size", defaults.default_pipeline_queue_size)
+        return Pipeline(
+            [
+                Stage("list", self._list_stage, workers["list"], queue_size),
+                Stage("detail", self._detail_stage, workers["detail"], queue_size),
+                Stage("persist", self._persist_stage, workers["persist"], queue_size),
+                Stage("filter", self._filter_stage, workers["filter"], queue_size),
+                Stage("notify", self._notify_stage, workers["notify"], queue_size),
+            ],
+            on_error=self._on_stage_error,
+        )
 
     def run_watch(self, bot_service, database):
+        self._watch_scheduler.start()
         watch_webhooks = bot_service.get_webhooks()
-        logger.info(f"Watching {len(watch_webhooks)} urls")
-        bot_service.on_start(watch_webhooks)
-
+        watch_queries = self._get_leased(WATCH_LEASE_GROUP, self._get_watch_queries(watch_webhooks), database)
+        self._poll_intervals.forget(set(self._poll_intervals.keys()) - watch_queries.keys())
+
+        if watch_queries.keys() != self._watch_queries.keys():
+            logger.info(f"Watching {len(watch_queries)} urls")
+            bot_service.on_start(watch_webhooks)
+        for query_key in self._watch_queries.keys() - watch_queries.keys():
+            self._watch_scheduler.cancel((WATCH_KEY, query_key))
+        for query_key, query in watch_queries.items():
+            if self._watch_queries.get(query_key) != query:
+                # every watch is polled on its own deadline, whatever the others are doing
+                delay = max(self._poll_intervals.get_next_poll([query_key]) - time.time(), 0)
+                self._watch_scheduler.schedule(
+                    (WATCH_KEY, query_key),
+                    functools.partial(self._poll_watch, query_key, query, bot_service, database),
+                    delay,
+                )
+        self._watch_queries = watch_queries
+
+        # new watches are picked up, and a summary of the polls sent, every min_recheck_interval
+        time.sleep(self._min_recheck_interval)
+        self._report_watch_cycle(watch_queries, bot_service)
+
+    def _poll_watch(self, query_key, query, bot_service, database):
+        catalog = self._request_executor.submit(self._scrape_watch_catalog, query_key, query["url"], database)
+        # the list stage is shared by every watch, a slow catalog is waited for here
+        concurrent.futures.wait([catalog])
+        batch = self._pipeline.submit(
+            [(catalog, query["webhooks"], (WATCH_KEY, query_key))], {"database": database, "bot_service": bot_service}
+        )
+        batch.wait()
+
+        result = batch.result[0] if batch.result else {"error": None}
+        if "error" in result:
+            if result["error"]:
+                logger.error(f"Error while scraping {query['url']}: {result['error']}")
+                bot_service.on_error(result["error"])
+            self._poll_intervals.record_poll(query_key, 0)
+        else:
+            self._poll_intervals.record_poll(query_key, result["new_items_count"])
+            if self._incremental_polling:
+                database.set_high_water_mark(query_key, max(item["id"] for item in result["items"]))
+
+        with self._watch_cycle_lock:
+            self._watch_cycle["polls"] += 1
+            self._watch_cycle["new_items"] += result.get("new_items_count", 0)
+            self._watch_cycle["errors"] += "error" in result
+        return max(self._poll_intervals.get_next_poll([query_key]) - time.time(), 0)
+
+    def _report_watch_cycle(self, watch_queries, bot_service):
+        with self._watch_cycle_lock:
+            summary = self._watch_cycle
+            self._watch_cycle = {"polls": 0, "new_items": 0, "errors": 0}
+
+        self._report_circuit_breakers(bot_service)
+        self._log_pipeline_metrics()
+        if summary["polls"]:
+            next_recheck = max(self._poll_intervals.get_next_poll(watch_queries.keys()) - time.time(), 0)
+            bot_service.on_finish(next_recheck, summary)
+            logger.info(
+                f"Polled {summary['polls']} urls, found {summary['new_items']} new items, "
+                f"next recheck in {next_recheck:.0f} seconds"
+            )
+
+    def _report_circuit_breakers(self, bot_service):
+        for endpoint, state in self._scraper.get_circuit_breakers_state().items():
+            is_open = state["state"] != CircuitBreaker.CLOSED
+            if is_open and endpoint not in self._open_circuit_breakers:
+                self._open_circuit_breakers.add(endpoint)
+                bot_service.on_circuit_breaker_open(endpoint, state)
+            elif not is_open and endpoint in self._open_circuit_breakers:
+                self._open_circuit_breakers.remove(endpoint)
+                bot_service.on_circuit_breaker_closed(endpoint)
+
+    def _get_leased(self, group, values, database):
+        if not self._sharding:
+            return values
+
+        with self._lease_manager_lock:
+            if not self._lease_manager:
+                self._lease_manager = LeaseManager(
+                    database, utils.get_config_value(self._config, "lease_ttl", defaults.default_lease_ttl)
+                )
+                self._lease_manager.start()
+        self._lease_manager.update_keys(group, values.keys())
+        return {key: value for key, value in values.items() if self._lease_manager.owns(group, key)}
+
+    def _get_watch_queries(self, watch_webhooks):
+        watch_queries = {}
         for webhook, value in watch_webhooks.items():
-            try:
-                self._process_url(value['url'], database, webhook=webhook, bot_service=bot_service)
-            except requests.exceptions.HTTPError as e:
-                logger.error(f"Error while scraping {value['url']}: {e}")
-                bot_service.on_error(e)
-
-        bot_service.on_finish()
-        logger.info(f"Next recheck in {self._config['recheck_interval']} seconds")
-        self._wait()
+            query_key = self._query_generator.get_query_key(value["url"])
+            query = watch_queries.setdefault(query_key, {"url": value["url"], "webhooks": []})
+            query["webhooks"].append(webhook)
+        return watch_queries
 
     def run_background_scraping(self, bot_service, database):
-        self._start_background_scrape_monitor_thread(bot_service, database)
+        self._start_background_scrape_monitor(bot_service, database)
 
     def run_random_scraping(self, bot_service, database):
+        self._catalog_index.start_refresh_thread()
         self._start_random_scrape_thread(bot_service, database)
 
     def _wait(self):
-        time.sleep(self._config["recheck_interval"])
-
-    def _process_url(self, url, database, page_start=1, page_end=None, webhook=None, bot_service=None):
-        params = self._query_generator.get_query(url)
-
-        items_ids = self._scraper.scrape_items(**params, start_page=page_start, end_page=page_end)
-        if not items_ids:
-            raise requests.exceptions.HTTPError(f"Items not found for {url}")
-
-        new_items_ids = database.get_no_dupes(database.items, items_ids)
-        logger.info(f"Found {len(new_items_ids)} new items for {url} (page start: {page_start}, page end: {page_end})")
-        for item_id in new_items_ids:
-            self._process_item(item_id, database, webhook, bot_service)
-
-    def _process_item(self, item_id, database, webhook=None, bot_service=None):
-        try:
-            json_item, json_user = self._scraper.scrape_item(item_id)
-
-            logger.debug(f"Item: {json_item}")
-            logger.debug(f"User: {json_user}")
+        self._stopped.wait(self._config["recheck_interval"])
 
-            self._on_data(json_item, database.items, database)
-            self._on_data(json_user, database.users, database)
-
-            if webhook and bot_service:
-                bot_service.process_item(json_item, json_user, webhook)
+    def _process_url(self, url, database, page_start=1, page_end=None, webhook=None, bot_service=None,
+                     pagination=None):
+        catalog = self._request_executor.submit(
+            self._scrape_catalog, url, page_start, page_end, pagination=pagination
+        )
+        return self._process_catalog(url, catalog, database, page_start, page_end, webhook, bot_service)
+
+    def _process_catalog(self, url, catalog, database, page_start, page_end=None, webhook=None, bot_service=None):
+        webhooks = [webhook] if webhook and bot_service else []
+        key = (BACKGROUND_SCRAPE_KEY, webhook) if webhooks else RANDOM_SCRAPE_KEY
+        concurrent.futures.wait([catalog])
+        batch = self._pipeline.submit(
+            [(catalog, webhooks, key)], {"database": database, "bot_service": bot_service}
+        )
+        # the items go on through the later stages while the next page is listed
+        batch.wait("list")
+        if not batch.result:
+            raise src.exceptions.RetryException(f"Couldn't list the items of {url}")
+        if "error" in batch.result[0]:
+            raise batch.result[0]["error"]
+
+        result = batch.result[0]
+        logger.info(f"Found {len(result['items'])} items for {url} (page start: {page_start}, page end: {page_end})")
+        return result
+
+    def _get_cursor_key(self, url, webhook=None):
+        # random scraping and each background scraping webhook read a catalog at their own pace
+        query_key = self._query_generator.get_query_key(url)
+        return f"{BACKGROUND_SCRAPE_KEY} {webhook} {query_key}" if webhook else f"{RANDOM_SCRAPE_KEY} {query_key}"
+
+    def _get_cursor(self, url, database, webhook=None):
+        cursor = database.get_cursor(self._get_cursor_key(url, webhook))
+        if not cursor or time.time() - cursor["updated_at"] > self._cursor_ttl:
+            return 1, None
+        logger.info(f"Resuming {url} at page {cursor['page'] + 1}")
+        return cursor["page"] + 1, cursor
+
+    def _advance_cursor(self, url, database, page, catalog_items, pagination, cursor=None, webhook=None):
+        # the listing is only compared to the cursor on the first page read after resuming
+        if cursor and cursor["total_entries"]:
+            drift = abs(pagination["total_entries"] - cursor["total_entries"]) / cursor["total_entries"]
+            if drift > self._cursor_max_drift:
+                logger.info(f"{url} changed by {drift:.0%} since page {cursor['page']}, restarting from page 1")
+                return 1
+        # once the last page is read, the next run starts over from page 1
+        last_page = pagination.get("total_pages") and page >= pagination["total_pages"]
+        database.set_cursor(
+            self._get_cursor_key(url, webhook),
+            url,
+            0 if last_page else page,
+            catalog_items[-1]["id"],
+            pagination["total_entries"],
+        )
+        return page + 1
 
-            logger.debug(f"Sleeping for {self._config['request_interval']} seconds")
-            time.sleep(self._config["request_interval"])
+    def _reset_cursor(self, url, database, webhook=None):
+        database.set_cursor(self._get_cursor_key(url, webhook), url, 0, None, 0)
 
-        except src.exceptions.RetryException as e:
-            logger.error(f"Error while scraping {item_id}, retrying: {e}")
+    def _scrape_watch_catalog(self, query_key, url, database):
+        if not self._incremental_polling:
+            return self._scrape_catalog(url)
 
-            if bot_service:
-                bot_service.on_error(e)
+        high_water_mark = database.get_high_water_mark(query_key)
+        # without a mark there's nothing to catch up on, the first page is enough
+        page_end = self._max_incremental_pages if high_water_mark else None
+        return self._scrape_catalog(url, page_end=page_end, order="newest_first", until_id=high_water_mark)
 
-            self._process_item(item_id, database, webhook, bot_service)
+    def _scrape_catalog(self, url, page_start=1, page_end=None, **kwargs):
+        params = self._query_generator.get_query(url)
+        params.update(kwargs)
 
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"Error while scraping {item_id}: {e}")
+        catalog_items = self._scraper.scrape_catalog(**params, start_page=page_start, end_page=page_end)
+        if not catalog_items:
+            raise requests.exceptions.HTTPError(f"Items not found for {url}")
+        return catalog_items
 
-            if bot_service:
-                bot_service.on_error(e)
-        
-        except Exception as e:
-            logger.error(f"Error while scraping {item_id}: {e}")
+    def _list_stage(self, catalogs, batch):
+        database = batch.context["database"]
+        bot_service = batch.context["bot_service"]
 
-            if bot_service:
-                bot_service.on_error(e)
+        results = []
+        for catalog, webhooks, key in catalogs:
+            try:
+                results.append({"items": catalog.result(), "webhooks": webhooks, "key": key})
+            except SCRAPE_EXCEPTIONS as e:
+                results.append({"error": e})
+        listed = [result for result in results if "items" in result]
+
+        # dedupe every catalog at once, before any of their items is stored
+        items_ids = list({item["id"] for result in listed for item in result["items"]})
+        new_items_ids = set(database.get_no_dupes(database.items, items_ids))
+
+        items_webhooks = {}
+        for result in listed:
+            # an item stored by an overlapping watch is still new to this one until it has been served
+            unserved_ids = self._recent_items.get_unserved(
+                result["key"], [item["id"] for item in result["items"]], new_items_ids
+            )
+            # items the catalog filters rejected are listed again on every poll, they're only new once
+            result["new_items_count"] = sum(unserved_ids.values())
+            for item in result["items"]:
+                if item["id"] not in unserved_ids:
+                    continue
+                webhooks = result["webhooks"]
+                passing_webhooks = [webhook for webhook in webhooks if bot_service.prefilter_item(item, webhook)]
+                if webhooks and not passing_webhooks:
+                    continue
+                item_webhooks, item_keys = items_webhooks.setdefault(item["id"], ([], []))
+                item_webhooks.extend(webhook for webhook in passing_webhooks if webhook not in item_webhooks)
+                item_keys.append(result["key"])
+
+        logger.info(f"Found {len(new_items_ids)} new items, {len(items_webhooks)} left after catalog filters")
+        batch.result = results
+        return [(item_id, webhooks, keys) for item_id, (webhooks, keys) in items_webhooks.items()]
+
+    def _detail_stage(self, item, batch):
+        item_id, webhooks, keys = item
+        # requests stay within the shared executor, its size is the global request budget
+        json_item, json_user = self._request_executor.submit(self._scraper.scrape_item, item_id).result()
+        return [(item_id, json_item, json_user, webhooks, keys)]
+
+    def _persist_stage(self, item, batch):
+        item_id, json_item, json_user, webhooks, keys = item
+        database = batch.context["database"]
+        logger.debug(f"Item: {json_item}")
+        logger.debug(f"User: {json_user}")
+
+        self._on_data(json_item, database.items, database)
+        self._on_data(json_user, database.users, database)
+        # an item that couldn't be fetched or stored is left unserved, the next poll retries it
+        for key in keys:
+            self._recent_items.mark_served(key, item_id)
+        return [(json_item, json_user, webhooks)] if webhooks and batch.context["bot_service"] else []
+
+    def _filter_stage(self, item, batch):
+        json_item, json_user, webhooks = item
+        bot_service = batch.context["bot_service"]
+        return [
+            (json_item, json_user, webhook)
+            for webhook in webhooks
+            if bot_service.validate_item(json_item, json_user, webhook)
+        ]
+
+    def _notify_stage(self, item, batch):
+        json_item, json_user, webhook = item
+        batch.context["bot_service"].send_item(json_item, json_user, webhook)
+
+    def _on_stage_error(self, stage_name, item, batch, e):
+        if isinstance(e, src.exceptions.CircuitOpenException):
+            # reported once by _report_circuit_breakers
+            logger.warning(f"Skipped item in {stage_name} stage: {e}")
+            return
+
+        logger.error(f"Error in {stage_name} stage: {e}")
+        bot_service = batch.context["bot_service"]
+        if bot_service:
+            bot_service.on_error(e)
+
+    def _log_pipeline_metrics(self):
+        for stage_name, metrics in self._pipeline.get_metrics().items():
+            logger.debug(
+                f"Stage {stage_name}: {metrics['queue_depth']}/{metrics['queue_size']} queued, "
+                f"{metrics['workers']} workers, {metrics['processed']} processed, {metrics['errors']} errors"
+            )
 
     def _on_data(self, json_data, collection, database):
-        return (
-            self._on_exists(json_data, collection, database)
-            if database.exists(json_data, collection)
-            else self._on_not_exists(json_data, collection, database)
-        )
-
-    def _on_exists(self, json_data, collection, database):
-        database.update(json_data, collection)
-        return True
+        database.upsert(json_data, collection)
 
-    def _on_not_exists(self, json_data, collection, database):
-        database.insert(json_data, collection)
-        return False
-
-    def _start_background_scrape_monitor_thread(self, bot_service, database):
-           self._background_scrape_monitor_thread = threading.Thread(target=self._background_scrape_monitor, args=(bot_service, database))
-           self._background_scrape_monitor_thread.start()
-
-    def _background_scrape_monitor(self, bot_service, database):
+    def _start_background_scrape_monitor(self, bot_service, database):
         logger.info(f"Starting background scraping monitor")
+        self._scheduler.start()
+        self._scheduler.schedule(
+            BACKGROUND_SCRAPE_MONITOR_KEY,
+            functools.partial(self._background_scrape_monitor, bot_service, database, {}),
+        )
 
-        background_scraping_webhooks = {}
-        while True:
-            new_background_scraping_webhooks = bot_service.get_background_scraping_webhooks()
-            if new_background_scraping_webhooks != background_scraping_webhooks:
-                background_scraping_webhooks = new_background_scraping_webhooks
-                for webhook, value in background_scraping_webhooks.items():
-                    thread_id = random.randint(0, 100000)
-                    self._start_background_scrape_thread(value['url'], database, thread_id, webhook, bot_service)
-                    time.sleep(1)
-            self._background_scrape_monitor_thread_started = True
-            self._wait()
-
-    def _start_background_scrape_thread(self, url, database, thread_id, webhook=None, bot_service=None):
-        self._threads.append(thread_id)
-        self._background_scrape_thread = threading.Thread(target=self._background_scrape, args=(url, database, thread_id, webhook, bot_service))
-        self._background_scrape_thread.start()
-
-    def _stop_background_scrape_thread(self, thread_id):
-        logger.debug(f"Stopping background scraping thread {thread_id}")
-        self._threads.remove(thread_id)
-
-    def _background_scrape(self, url, database, thread_id, webhook=None, bot_service=None):
+    def _background_scrape_monitor(self, bot_service, database, background_scraping_webhooks):
+        new_background_scraping_webhooks = self._get_leased(
+            BACKGROUND_SCRAPE_KEY, bot_service.get_background_scraping_webhooks(), database
+        )
+        for webhook, value in new_background_scraping_webhooks.items():
+            if background_scraping_webhooks.get(webhook) != value:
+                self._scheduler.schedule(
+                    (BACKGROUND_SCRAPE_KEY, webhook),
+                    self._create_background_scrape_task(value["url"], database, webhook, bot_service),
+                )
+        for webhook in background_scraping_webhooks.keys() - new_background_scraping_webhooks.keys():
+            logger.info(f"Stopping background scraping for {background_scraping_webhooks[webhook]['url']}")
+            self._scheduler.cancel((BACKGROUND_SCRAPE_KEY, webhook))
+
+        background_scraping_webhooks.clear()
+        background_scraping_webhooks.update(new_background_scraping_webhooks)
+        self._background_scrape_monitor_started = True
+        self._log_pipeline_metrics()
+        return self._config["recheck_interval"]
+
+    def _has_background_scrape_tasks(self):
+        return any(key[0] == BACKGROUND_SCRAPE_KEY for key in self._scheduler.keys())
+
+    def _create_background_scrape_task(self, url, database, webhook=None, bot_service=None):
         logger.info(f"Starting background scraping for {url}")
-        logger.debug(f"Thread id: {thread_id}")
-        page_start = 1
-        while thread_id in self._threads:
-            try:
-                self._process_url(url, database, page_start, webhook=webhook, bot_service=bot_service)
-            except requests.exceptions.HTTPError as e:
-                logger.error(f"Error while scraping {url}: {e}")
-
-                if bot_service and webhook:
-                    data = {
-                        'content': "️️❌ No more items found",
-                    }
-                    bot_service.send_data(data, webhook)
-
-                self._stop_background_scrape_thread(thread_id)
-            page_start += 1
+        page, cursor = self._get_cursor(url, database, webhook)
+        # pages page + 1..page + prefetch_pages are requested while page is processed
+        state = {"page": page, "pages": deque(), "cursor": cursor}
+        return functools.partial(self._background_scrape, url, database, state, webhook, bot_service)
+
+    def _background_scrape(self, url, database, state, webhook=None, bot_service=None):
+        pages = state["pages"]
+        while len(pages) <= self._prefetch_pages:
+            pagination = {}
+            catalog = self._request_executor.submit(
+                self._scrape_catalog, url, state["page"] + len(pages), pagination=pagination
+            )
+            pages.append((catalog, pagination))
+        try:
+            catalog, pagination = pages.popleft()
+            result = self._process_catalog(
+                url, catalog, database, state["page"], webhook=webhook, bot_service=bot_service
+            )
+            next_page = self._advance_cursor(
+                url, database, state["page"], result["items"], pagination, state["cursor"], webhook
+            )
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Error while scraping {url}: {e}")
+            self._cancel_pages(pages)
+            self._reset_cursor(url, database, webhook)
+
+            if bot_service and webhook:
+                data = {
+                    'content': "️️❌ No more items found",
+                }
+                bot_service.send_data(data, webhook)
+
+            return None
+        except SCRAPE_EXCEPTIONS as e:
+            logger.error(f"Error while scraping {url}, retrying: {e}")
+            self._cancel_pages(pages)
+            return self._config["recheck_interval"]
+        except Exception:
+            # retried by the scheduler, from the page that failed rather than the prefetched ones
+            self._cancel_pages(pages)
+            raise
+        if next_page != state["page"] + 1:
+            self._cancel_pages(pages)
+        state["page"] = next_page
+        state["cursor"] = None
+        return 0
+
+    def _cancel_pages(self, pages):
+        for catalog, _ in pages:
+            catalog.cancel()
+        pages.clear()
 
     def _start_random_scrape_thread(self, bot_service, database):
-        self._random_scrape_thread = threading.Thread(target=self._random_scrape, args=(bot_service, database))
+        self._random_scrape_thread = threading.Thread(
+            target=self._random_scrape, args=(bot_service, database), daemon=True
+        )
         self._random_scrape_thread.start()
 
     def _random_scrape(self, bot_service, database):
         logger.info(f"Starting random scraping")
-        while True:
-            while not self._threads and self._background_scrape_monitor_thread_started:
+        while not self._stopped.is_set():
+            while (
+                not self._stopped.is_set()
+                and not self._has_background_scrape_tasks()
+                and self._background_scrape_monitor_started
+            ):
                 try:
-                    url = self._get_random_scrape_url()
+                    catalog_id = self._category_sampler.sample(self._catalog_index.ids())
+                    url = self._get_random_scrape_url(catalog_id)
                     logger.info(f"Random scraping {url}")
-                    page_start = 1
-                    while True:
-                        self._process_url(url, database, page_start=page_start, bot_service=bot_service)
-                        page_start += 1
-
-                except requests.exceptions.HTTPError as e:
+                    page_start, cursor = self._get_cursor(url, database)
+                    duplicate_pages = 0
+                    while duplicate_pages < self._max_duplicate_pages:
+                        pagination = {}
+                        try:
+                            result = self._process_url(
+                                url, database, page_start=page_start, bot_service=bot_service, pagination=pagination
+                            )
+                        except requests.exceptions.HTTPError:
+                            # past the end of the catalog, the request found nothing new either
+                            self._category_sampler.record(catalog_id, 0)
+                            self._reset_cursor(url, database)
+                            logger.info(f"Reached the end of {url}")
+                            break
+                        self._category_sampler.record(catalog_id, result["new_items_count"])
+                        duplicate_pages = 0 if result["new_items_count"] else duplicate_pages + 1
+                        page_start = self._advance_cursor(
+                            url, database, page_start, result["items"], pagination, cursor
+                        )
+                        cursor = None
+                    else:
+                        logger.info(f"Stopped random scraping {url} after {duplicate_pages} pages without new items")
+
+                except SCRAPE_EXCEPTIONS as e:
                     logger.error(f"Error while scraping {url}: {e}")
 
                     if bot_service:
                         bot_service.on_error(e)
             self._wait()
 
-    def _get_random_scrape_url(self):
-        cats = self._scraper.scrape_cats()
-        cats_list = list(cats.keys())
-        random_cat = random.choice(cats_list)
-        url = f"https://www.vinted.fr/catalog?catalog[]={random_cat}"
+    def _get_random_scrape_url(self, catalog_id):
+        url = f"https://www.vinted.fr/catalog?catalog[]={catalog_id}"
         return url
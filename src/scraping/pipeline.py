@@ -0,0 +1,115 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger("scraper")
+
+
+class Batch:
+    def __init__(self, stages_names, context=None):
+        self.context = context or {}
+        self.result = None
+        self._stages_names = stages_names
+        self._pending = [0] * len(stages_names)
+        self._condition = threading.Condition()
+
+    def wait(self, stage_name=None):
+        # jobs only move forward, once a stage and the ones before it are empty they stay empty
+        last_stage = self._stages_names.index(stage_name) if stage_name else len(self._stages_names) - 1
+        with self._condition:
+            while any(self._pending[: last_stage + 1]):
+                self._condition.wait()
+
+    def _add(self, stage_index):
+        with self._condition:
+            self._pending[stage_index] += 1
+
+    def _done(self, stage_index):
+        with self._condition:
+            self._pending[stage_index] -= 1
+            self._condition.notify_all()
+
+
+class Stage:
+    def __init__(self, name, func, workers, queue_size):
+        self.name = name
+        self._func = func
+        self._workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._index = None
+        self._next_stage = None
+        self._on_error = None
+        self._processed = 0
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    def put(self, payload, batch):
+        batch._add(self._index)
+        # blocks while the stage is full, slowing down the stages feeding it
+        self._queue.put((payload, batch))
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                "workers": self._workers,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "processed": self._processed,
+                "errors": self._errors,
+            }
+
+    def _start(self, index, next_stage, on_error):
+        self._index = index
+        self._next_stage = next_stage
+        self._on_error = on_error
+        for worker_index in range(self._workers):
+            threading.Thread(target=self._work, name=f"{self.name}-{worker_index}", daemon=True).start()
+
+    def _work(self):
+        while True:
+            payload, batch = self._queue.get()
+            try:
+                for next_payload in self._func(payload, batch) or ():
+                    if self._next_stage:
+                        self._next_stage.put(next_payload, batch)
+                with self._lock:
+                    self._processed += 1
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                if self._on_error:
+                    try:
+                        self._on_error(self.name, payload, batch, e)
+                    except Exception as on_error_e:
+                        # a worker leaving its loop would block every later batch
+                        logger.error(f"Error while handling an error in {self.name} stage: {on_error_e}")
+                else:
+                    logger.error(f"Error in {self.name} stage: {e}")
+            finally:
+                batch._done(self._index)
+
+
+class Pipeline:
+    def __init__(self, stages, on_error=None):
+        self._stages = stages
+        self._on_error = on_error
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for index, stage in enumerate(self._stages):
+                next_stage = self._stages[index + 1] if index + 1 < len(self._stages) else None
+                stage._start(index, next_stage, self._on_error)
+            self._started = True
+
+    def submit(self, payload, context=None):
+        self.start()
+        batch = Batch([stage.name for stage in self._stages], context)
+        self._stages[0].put(payload, batch)
+        return batch
+
+    def get_metrics(self):
+        return {stage.name: stage.get_metrics() for stage in self._stages}
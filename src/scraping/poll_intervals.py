@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger("scraper")
+
+
+class PollIntervals:
+    def __init__(self, initial_interval, min_interval, max_interval, smoothing=0.3):
+        self._initial_interval = min(max(initial_interval, min_interval), max_interval)
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._smoothing = smoothing
+        self._watches = {}
+        self._lock = threading.Lock()
+
+    def get_next_poll(self, keys):
+        with self._lock:
+            return min(
+                (self._watches[key]["next_poll"] if key in self._watches else time.time() for key in keys),
+                default=time.time() + self._initial_interval,
+            )
+
+    def record_poll(self, key, new_items_count, now=None):
+        now = now or time.time()
+        with self._lock:
+            watch = self._watches.get(key)
+            if watch is None:
+                # one poll says nothing about the arrival rate yet
+                watch = {"rate": None, "interval": self._initial_interval}
+                self._watches[key] = watch
+            else:
+                observed_rate = new_items_count / max(now - watch["last_poll"], 1)
+                watch["rate"] = (
+                    observed_rate
+                    if watch["rate"] is None
+                    else self._smoothing * observed_rate + (1 - self._smoothing) * watch["rate"]
+                )
+                # aim for about one new item per poll
+                interval = 1 / watch["rate"] if watch["rate"] > 0 else self._max_interval
+                watch["interval"] = min(max(interval, self._min_interval), self._max_interval)
+            watch["last_poll"] = now
+            watch["next_poll"] = now + watch["interval"]
+        logger.debug(f"Next poll of {key} in {watch['interval']:.0f}s")
+
+    def forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._watches.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._watches)
@@ -1,4 +1,4 @@
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlencode, urlparse, parse_qs
 
 
 class QueryGenerator:
@@ -21,3 +21,9 @@ class QueryGenerator:
             params['catalog_ids'] = params.pop('catalog')
 
         return params
+
+    def get_query_key(self, vinted_url):
+        query = self.get_query(vinted_url)
+        return urlencode(
+            sorted((key, sorted(values)) for key, values in query.items()), doseq=True
+        )
@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger("scraper")
+
+
+class RateLimiter:
+    def __init__(self, rate, min_rate, max_rate, rate_increase, burst=1):
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._rate_increase = rate_increase
+        self._burst = burst
+        self._rate = min(max(rate, min_rate), max_rate)
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return time.monotonic()
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            # additive increase: about rate_increase requests/s more for every second of successes
+            self._rate = min(self._max_rate, self._rate + self._rate_increase / self._rate)
+
+    def on_rate_limit(self, issued_at):
+        with self._lock:
+            # requests issued before the last decrease were sent at the old rate, don't punish twice
+            if issued_at < self._last_decrease:
+                return
+            self._refill()
+            self._rate = max(self._min_rate, self._rate / 2)
+            self._tokens = 0
+            self._last_decrease = time.monotonic()
+            logger.warning(f"Rate limited, lowering request rate to {self._rate:.2f} requests/s")
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class RecentItems:
+    # items found new lately, with the watches that listed and were served each of them
+    def __init__(self, ttl):
+        self._ttl = ttl
+        # item id -> (found_at, bits of the watches that listed it, bits of the ones served it)
+        self._items = {}
+        self._bits = {}
+        self._lock = threading.Lock()
+
+    def get_unserved(self, key, items_ids, new_items_ids):
+        # maps each unserved id to whether the watch lists it for the first time
+        now = time.time()
+        unserved = {}
+        with self._lock:
+            self._expire(now)
+            bit = self._get_bit(key)
+            for item_id in items_ids:
+                item = self._items.get(item_id)
+                if item is None:
+                    # stored before it could be tracked, it is known to every watch
+                    if item_id not in new_items_ids:
+                        continue
+                    item = (now, 0, 0)
+                found_at, listed, served = item
+                if not served & bit:
+                    unserved[item_id] = not listed & bit
+                self._items[item_id] = (found_at, listed | bit, served)
+        return unserved
+
+    def mark_served(self, key, item_id):
+        with self._lock:
+            if item_id in self._items:
+                found_at, listed, served = self._items[item_id]
+                self._items[item_id] = (found_at, listed, served | self._get_bit(key))
+
+    def _get_bit(self, key):
+        if key not in self._bits:
+            self._bits[key] = 1 << len(self._bits)
+        return self._bits[key]
+
+    def _expire(self, now):
+        # items are added in the order they are found, the oldest come first
+        while self._items:
+            item_id = next(iter(self._items))
+            if now - self._items[item_id][0] <= self._ttl:
+                return
+            del self._items[item_id]
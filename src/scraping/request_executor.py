@@ -0,0 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RequestExecutor:
+    def __init__(self, max_concurrent_requests):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_requests, thread_name_prefix="scraper"
+        )
+
+    def submit(self, func, *args, **kwargs):
+        # the executor is shared by every caller, so its size is the global request budget
+        return self._executor.submit(func, *args, **kwargs)
@@ -0,0 +1,87 @@
+import logging
+import random
+import threading
+import time
+
+import requests.exceptions
+
+from src.exceptions import CircuitOpenException, RetryException
+
+logger = logging.getLogger("scraper")
+
+RETRYABLE_EXCEPTIONS = (
+    RetryException,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts, base_delay, max_delay):
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+
+    def call(self, func, *args, **kwargs):
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except RETRYABLE_EXCEPTIONS as e:
+                if attempt >= self._max_attempts:
+                    raise
+                # full jitter keeps the threads hitting the same error from retrying in lockstep
+                delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** (attempt - 1)))
+                logger.warning(f"Attempt {attempt}/{self._max_attempts} failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                attempt += 1
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN and time.time() - self._opened_at >= self._reset_timeout:
+                # let a single trial request through
+                logger.info(f"Circuit breaker {self._name} half-open")
+                self._state = self.HALF_OPEN
+                return
+            raise CircuitOpenException(f"Circuit breaker {self._name} is {self._state}")
+
+    def on_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker {self._name} closed")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def on_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self._failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit breaker {self._name} open after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.time()
+
+    def get_state(self):
+        with self._lock:
+            return {
+                "state": self._state,
+                "failures": self._failures,
+                "opened_at": self._opened_at,
+            }
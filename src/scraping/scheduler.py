@@ -0,0 +1,106 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger("scraper")
+
+
+class _Task:
+    def __init__(self, key, func):
+        self.key = key
+        self.func = func
+
+
+class Scheduler:
+    def __init__(self, max_workers, retry_delay):
+        self._max_workers = max_workers
+        self._retry_delay = retry_delay
+        self._queue = []
+        self._tasks = {}
+        self._running = set()
+        self._deferred = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+
+    def start(self):
+        with self._condition:
+            if self._workers:
+                return
+            for index in range(self._max_workers):
+                worker = threading.Thread(
+                    target=self._work, name=f"scheduler-{index}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def schedule(self, key, func, delay=0):
+        with self._condition:
+            # replacing the task drops its pending runs, a running one finishes without being rescheduled
+            task = _Task(key, func)
+            self._tasks[key] = task
+            self._push(task, delay)
+        logger.debug(f"Scheduled {key} in {delay}s")
+
+    def cancel(self, key):
+        with self._condition:
+            self._tasks.pop(key, None)
+        logger.debug(f"Cancelled {key}")
+
+    def keys(self):
+        with self._condition:
+            return list(self._tasks)
+
+    def __contains__(self, key):
+        with self._condition:
+            return key in self._tasks
+
+    def _push(self, task, delay):
+        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), task))
+        self._condition.notify()
+
+    def _work(self):
+        while True:
+            task = self._next_task()
+            try:
+                delay = task.func()
+            except Exception as e:
+                # a failing task is retried, only returning None ends it
+                logger.error(f"Error while running {task.key}, retrying in {self._retry_delay}s: {e}")
+                delay = self._retry_delay
+
+            with self._condition:
+                self._running.discard(task.key)
+                deferred_task = self._deferred.pop(task.key, None)
+                if deferred_task is not None:
+                    self._push(deferred_task, 0)
+                if self._tasks.get(task.key) is not task:
+                    continue
+                if delay is None:
+                    del self._tasks[task.key]
+                else:
+                    self._push(task, delay)
+
+    def _next_task(self):
+        with self._condition:
+            while True:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                due, _, task = self._queue[0]
+                if self._tasks.get(task.key) is not task:
+                    heapq.heappop(self._queue)
+                    continue
+                now = time.monotonic()
+                if due > now:
+                    self._condition.wait(due - now)
+                    continue
+                heapq.heappop(self._queue)
+                if task.key in self._running:
+                    # the replaced version of this task is still running, never run both at once
+                    self._deferred[task.key] = task
+                    continue
+                self._running.add(task.key)
+                return task
@@ -1,24 +1,119 @@
 import logging
+import src.defaults as defaults
+import src.utils as utils
+from src.http_client import create_http_client
 from src.scraping.cookies_manager import CookiesManager
+from src.scraping.detail_cache import DetailCache
+from src.scraping.identity_pool import Identity, IdentityPool
+from src.scraping.rate_limiter import RateLimiter
+from src.scraping.retry_policy import CircuitBreaker, RetryPolicy
 from src.exceptions import RetryException
 from src.scraping.vinted_codes import VintedCodes
 
 import requests
-import time
 
 logger = logging.getLogger("scraper")
 
 
 class Scraper:
-    def __init__(self, config):
-        self._headers = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/117.0",
-            "Connection": "keep-alive",
+    ENDPOINTS = ["catalog", "item", "user", "catalogs"]
+
+    def __init__(self, config, http_client=None, name="scraper"):
+        self._vinted_url = utils.get_config_value(config, "vinted_url", defaults.default_vinted_url)
+        self._http_client = http_client or create_http_client(config)
+        self._identity_pool = self._create_identity_pool(config)
+        self._retry_policy = RetryPolicy(
+            max_attempts=utils.get_config_value(config, "max_attempts", defaults.default_max_attempts),
+            base_delay=utils.get_config_value(config, "retry_base_delay", defaults.default_retry_base_delay),
+            max_delay=utils.get_config_value(config, "retry_max_delay", defaults.default_retry_max_delay),
+        )
+        self._circuit_breakers = {
+            endpoint: CircuitBreaker(
+                endpoint,
+                failure_threshold=utils.get_config_value(
+                    config, "circuit_failure_threshold", defaults.default_circuit_failure_threshold
+                ),
+                reset_timeout=utils.get_config_value(
+                    config, "circuit_reset_timeout", defaults.default_circuit_reset_timeout
+                ),
+            )
+            for endpoint in self.ENDPOINTS
         }
-        self._cookies_manager = CookiesManager(self._headers)
+        detail_cache_size = utils.get_config_value(config, "detail_cache_size", defaults.default_detail_cache_size)
+        detail_cache_path = utils.get_config_value(config, "detail_cache_path", None)
+        if detail_cache_path:
+            # shelve files can't be shared between processes, each one caches to its own
+            detail_cache_path = f"{detail_cache_path}.{name}"
+        self._items_cache = DetailCache(
+            "items",
+            detail_cache_size,
+            utils.get_config_value(config, "item_cache_ttl", defaults.default_item_cache_ttl),
+            detail_cache_path,
+        )
+        self._users_cache = DetailCache(
+            "users",
+            detail_cache_size,
+            utils.get_config_value(config, "user_cache_ttl", defaults.default_user_cache_ttl),
+            detail_cache_path,
+        )
         self._config = config
 
-    def scrape_items(self,
+    def close(self):
+        self._items_cache.close()
+        self._users_cache.close()
+
+    def get_circuit_breakers_state(self):
+        return {
+            endpoint: circuit_breaker.get_state()
+            for endpoint, circuit_breaker in self._circuit_breakers.items()
+        }
+
+    def _create_identity_pool(self, config):
+        identities_config = utils.get_config_value(config, "identities", None)
+        # without identities every request goes out directly, keeping the unsuffixed cookies file
+        identities = [
+            self._create_identity(
+                config,
+                identity_config.get("name", str(index)),
+                identity_config.get("user_agent", defaults.default_user_agent),
+                identity_config.get("proxy"),
+            )
+            for index, identity_config in enumerate(identities_config)
+        ] if identities_config else [
+            self._create_identity(config, None, defaults.default_user_agent, None)
+        ]
+        return IdentityPool(
+            identities,
+            utils.get_config_value(config, "identity_cooldown", defaults.default_identity_cooldown),
+        )
+
+    def _create_identity(self, config, name, user_agent, proxy):
+        headers = {
+            "User-Agent": user_agent,
+            "Connection": "keep-alive",
+        }
+        proxies = {"http": proxy, "https": proxy} if proxy else None
+        rate_limiter = self._create_rate_limiter(config)
+        cookies_manager = CookiesManager(config, headers, self._http_client, rate_limiter, proxies, name)
+        return Identity(name or "default", headers, proxies, cookies_manager, rate_limiter)
+
+    def _create_rate_limiter(self, config):
+        max_rate = utils.get_config_value(config, "max_request_rate", defaults.default_max_request_rate)
+        request_interval = config["request_interval"]
+        return RateLimiter(
+            rate=1 / request_interval if request_interval > 0 else max_rate,
+            min_rate=utils.get_config_value(config, "min_request_rate", defaults.default_min_request_rate),
+            max_rate=max_rate,
+            rate_increase=utils.get_config_value(
+                config, "request_rate_increase", defaults.default_request_rate_increase
+            ),
+            burst=utils.get_config_value(config, "request_burst", defaults.default_request_burst),
+        )
+
+    def scrape_items(self, **kwargs):
+        return [item["id"] for item in self.scrape_catalog(**kwargs)]
+
+    def scrape_catalog(self,
                      start_page=1,
                      end_page=None,
                      catalog_ids=None,
@@ -32,8 +127,10 @@ class Scraper:
                      price_from=None,
                      price_to=None,
                      order="relevance",
+                     until_id=None,
+                     pagination=None,
                         ):
-        base_url = "https://www.vinted.fr/api/v2/catalog/items"
+        base_url = f"{self._vinted_url}/api/v2/catalog/items"
         query_params = {
             "page": start_page,
             "catalog_ids[]": catalog_ids,
@@ -50,7 +147,7 @@ class Scraper:
         }
         logger.debug(f"Scraping items with params: {query_params}")
 
-        items_ids = []
+        catalog_items = []
 
         scrape_all = False
         if end_page == -1:
@@ -60,82 +157,96 @@ class Scraper:
 
         items = [None]
         while (query_params['page'] <= end_page or scrape_all) and len(items):
-            response = requests.get(base_url, params=query_params, headers=self._headers)
-            json_response = response.json()
-            self._check_code(json_response)
-            
+            json_response = self._get("catalog", base_url, params=query_params)
+
             current_page = json_response["pagination"]["current_page"]
             total_pages = json_response["pagination"]["total_pages"]
 
             items = json_response["items"]
-            items_ids.extend([item["id"] for item in items])
+            catalog_items.extend(items)
+            # filled with the pagination of the last page read, for callers keeping track of the listing
+            if pagination is not None:
+                pagination.update(json_response["pagination"])
 
             if current_page == total_pages:
                 break
+            # pages are newest first, stop once the last item of the page is one we already know
+            if until_id is not None and items and items[-1]["id"] <= until_id:
+                break
 
             query_params["page"] = current_page + 1
-            time.sleep(self._config['request_interval'])
-        return items_ids
+        return catalog_items
 
     def scrape_item(self, item_id):
+        return self._items_cache.get_or_fetch(item_id, lambda: self._scrape_item(item_id))
+
+    def scrape_user(self, user_id):
+        return self._users_cache.get_or_fetch(user_id, lambda: self._scrape_user(user_id))
+
+    def _scrape_item(self, item_id):
         logger.debug(f"Scraping item: {item_id}")
 
-        api_url = f"https://www.vinted.fr/api/v2/items/{item_id}"
+        api_url = f"{self._vinted_url}/api/v2/items/{item_id}"
 
-        response = requests.get(api_url, headers=self._headers)
-        json_response = response.json()
-        self._check_code(json_response)
+        json_response = self._get("item", api_url)
         json_item = json_response["item"]
 
         json_user = json_item.pop("user")
         json_item["user"] = json_user["id"]
+        self._users_cache.set(json_user["id"], json_user)
         return json_item, json_user
 
-    def scrape_user(self, user_id):
+    def _scrape_user(self, user_id):
         logger.debug(f"Scraping user: {user_id}")
 
-        api_url = f"https://www.vinted.fr/api/v2/users/{user_id}"
+        api_url = f"{self._vinted_url}/api/v2/users/{user_id}"
 
-        response = requests.get(api_url, headers=self._headers)
-        json_response = response.json()
-        self._check_code(json_response)
+        json_response = self._get("user", api_url)
 
         json_user = json_response["user"]
         return json_user
 
-    def _check_code(self, json_response):
+    def _get(self, endpoint, url, params=None):
+        return self._retry_policy.call(self._request, endpoint, url, params)
+
+    def _request(self, endpoint, url, params):
+        circuit_breaker = self._circuit_breakers[endpoint]
+        circuit_breaker.before_request()
+        try:
+            identity = self._identity_pool.acquire()
+            cookies, cookies_generation = identity.cookies_manager.get_cookies()
+            headers = {**identity.headers, "Cookie": cookies}
+            issued_at = identity.rate_limiter.acquire()
+            response = self._http_client.get(url, params=params, headers=headers, proxies=identity.proxies)
+            json_response = response.json()
+            self._check_code(json_response, identity, issued_at, cookies_generation)
+        except requests.exceptions.HTTPError:
+            # content not found is a valid answer
+            circuit_breaker.on_success()
+            raise
+        except Exception:
+            circuit_breaker.on_failure()
+            raise
+        circuit_breaker.on_success()
+        return json_response
+
+    def _check_code(self, json_response, identity, issued_at, cookies_generation):
+        if json_response['code'] == VintedCodes.RATE_LIMIT.value:
+            logger.warning(f"Rate limit exceeded: {json_response}")
+            identity.rate_limiter.on_rate_limit(issued_at)
+            self._identity_pool.on_rate_limit(identity)
+            raise RetryException(f"Rate limit exceeded: {json_response}")
+        identity.rate_limiter.on_success()
+
         if json_response['code'] == VintedCodes.NOT_FOUND.value:
             logger.warning(f"Content not found: {json_response}")
             raise requests.exceptions.HTTPError(f"Content not found: {json_response}")
         if json_response['code'] == VintedCodes.INVALID_SESSION.value:
             logger.warning(f"Cookies expired: {json_response}")
-            self._cookies_manager.renew_cookies()
+            identity.cookies_manager.renew_cookies(cookies_generation)
             raise RetryException(f"Cookies expired: {json_response}")
-        if json_response['code'] == VintedCodes.RATE_LIMIT.value:
-            logger.warning(f"Rate limit exceeded: {json_response}")
-            time.sleep(10)
-            raise RetryException(f"Rate limit exceeded: {json_response}")
 
     def scrape_cats(self):
-        api_url = "https://www.vinted.fr/api/v2/catalogs"
-        response = requests.get(api_url, headers=self._headers)
-        json_response = response.json()
-        self._check_code(json_response)
-
-        catalogs = self._get_all_catalogs(json_response)
-        return catalogs
-
-    def _get_all_catalogs(self, json_item):
-        all_catalogs = {}
-        current_path = []
-
-        for catalog in json_item["catalogs"]:
-            self._get_all_catalogs_recursive(catalog, current_path.copy(), all_catalogs)
-        return all_catalogs
-
-    def _get_all_catalogs_recursive(self, json_item, current_path, all_catalogs):
-        current_path.append(json_item["id"])
-        all_catalogs[json_item["id"]] = current_path
-        for catalog in json_item["catalogs"]:
-            self._get_all_catalogs_recursive(catalog, current_path.copy(), all_catalogs)
-        current_path.pop()
+        api_url = f"{self._vinted_url}/api/v2/catalogs"
+        json_response = self._get("catalogs", api_url)
+        return json_response["catalogs"]
@@ -0,0 +1,58 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+# past this many ids a 8KiB bitmap is smaller than a sorted array of 16 bits ids
+ARRAY_MAX_SIZE = 4096
+
+
+class SeenIds:
+    # integer ids are grouped by their high bits, each group holds its low 16 bits in a sorted array or a bitmap
+    def __init__(self):
+        self._containers = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def add(self, id):
+        high, low = id >> 16, id & 0xFFFF
+        with self._lock:
+            container = self._containers.get(high)
+            if container is None:
+                self._containers[high] = array("H", [low])
+            elif isinstance(container, array):
+                index = bisect_left(container, low)
+                if index < len(container) and container[index] == low:
+                    return
+                container.insert(index, low)
+                if len(container) > ARRAY_MAX_SIZE:
+                    self._containers[high] = self._to_bitmap(container)
+            else:
+                if container[low >> 3] & (1 << (low & 7)):
+                    return
+                container[low >> 3] |= 1 << (low & 7)
+            self._size += 1
+
+    def clear(self):
+        with self._lock:
+            self._containers = {}
+            self._size = 0
+
+    def __contains__(self, id):
+        high, low = id >> 16, id & 0xFFFF
+        with self._lock:
+            container = self._containers.get(high)
+            if container is None:
+                return False
+            if isinstance(container, array):
+                index = bisect_left(container, low)
+                return index < len(container) and container[index] == low
+            return bool(container[low >> 3] & (1 << (low & 7)))
+
+    def __len__(self):
+        return self._size
+
+    def _to_bitmap(self, container):
+        bitmap = bytearray(8192)
+        for low in container:
+            bitmap[low >> 3] |= 1 << (low & 7)
+        return bitmap
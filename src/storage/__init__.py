@@ -0,0 +1,10 @@
+import src.defaults as defaults
+import src.utils as utils
+from src.storage.mongo_backend import MongoBackend
+from src.storage.sqlite_backend import SqliteBackend
+
+
+def create_backend(config):
+    if utils.get_config_value(config, "backend", defaults.default_backend) == "sqlite":
+        return SqliteBackend(utils.get_config_value(config, "sqlite_path", defaults.default_sqlite_path))
+    return MongoBackend(config["connection_string"], config["db_name"])
@@ -0,0 +1,120 @@
+import functools
+import logging
+
+import pymongo
+from src.exceptions import DuplicateKeyException, StorageException
+
+logger = logging.getLogger("database")
+
+
+def _translate_errors(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except pymongo.errors.DuplicateKeyError as e:
+            raise DuplicateKeyException(e) from e
+        except pymongo.errors.PyMongoError as e:
+            raise StorageException(e) from e
+
+    return wrapper
+
+
+class MongoBackend:
+    def __init__(self, connection_string, db_name):
+        self._client = pymongo.MongoClient(connection_string)
+
+        self._check_connection()
+
+        logger.info("Using database: %s", db_name)
+        self._db = self._client[db_name]
+
+    def _check_connection(self):
+        logger.info("Checking connection to the database")
+        try:
+            self._client.server_info()
+        except pymongo.errors.ServerSelectionTimeoutError:
+            logger.error("Couldn't connect to the database")
+            raise ConnectionError
+        except pymongo.errors.OperationFailure:
+            logger.error("Couldn't authenticate to the database")
+            raise ConnectionError
+        logger.info("Successfully connected to the database")
+
+    @_translate_errors
+    def create_index(self, collection, unique=True):
+        self._db[collection.name].create_index(collection.unique_key, unique=unique)
+
+    @_translate_errors
+    def find_one(self, collection, key):
+        return self._db[collection.name].find_one({collection.unique_key: key}, {"_id": 0})
+
+    @_translate_errors
+    def find_keys(self, collection, keys):
+        return {
+            document[collection.unique_key]
+            for document in self._db[collection.name].find(
+                {collection.unique_key: {"$in": keys}}, {collection.unique_key: 1, "_id": 0}
+            )
+        }
+
+    def iter_keys(self, collection):
+        # a generator, its errors are raised while iterating
+        try:
+            for document in self._db[collection.name].find({}, {collection.unique_key: 1, "_id": 0}).sort(
+                collection.unique_key
+            ):
+                yield document[collection.unique_key]
+        except pymongo.errors.PyMongoError as e:
+            raise StorageException(e) from e
+
+    @_translate_errors
+    def find_greater(self, collection, field, value):
+        return list(self._db[collection.name].find({field: {"$gt": value}}, {"_id": 0}))
+
+    @_translate_errors
+    def insert_one(self, collection, document):
+        self._db[collection.name].insert_one(dict(document))
+
+    @_translate_errors
+    def update_one(self, collection, key, fields):
+        self._db[collection.name].update_one({collection.unique_key: key}, {"$set": fields}, upsert=True)
+
+    @_translate_errors
+    def upsert_many(self, collection, documents):
+        self._db[collection.name].bulk_write(
+            [
+                pymongo.UpdateOne({collection.unique_key: key}, {"$set": document}, upsert=True)
+                for key, document in documents.items()
+            ],
+            ordered=False,
+        )
+
+    @_translate_errors
+    def set_max(self, collection, key, field, value):
+        self._db[collection.name].update_one({collection.unique_key: key}, {"$max": {field: value}}, upsert=True)
+
+    @_translate_errors
+    def increment(self, collection, key, field):
+        self._db[collection.name].update_one({collection.unique_key: key}, {"$inc": {field: 1}}, upsert=True)
+
+    @_translate_errors
+    def acquire_lease(self, collection, key, owner, expires_at, now):
+        try:
+            self._db[collection.name].update_one(
+                {collection.unique_key: key, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"owner": owner, "expires_at": expires_at}},
+                upsert=True,
+            )
+        except pymongo.errors.DuplicateKeyError:
+            # held by another instance
+            return False
+        return True
+
+    @_translate_errors
+    def release_lease(self, collection, key, owner):
+        self._db[collection.name].delete_one({collection.unique_key: key, "owner": owner})
+
+    @_translate_errors
+    def drop(self, collection):
+        self._db[collection.name].drop()
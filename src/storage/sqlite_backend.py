@@ -0,0 +1,161 @@
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from src.exceptions import DuplicateKeyException, StorageException
+
+logger = logging.getLogger("database")
+
+# below SQLite's default limit of host parameters per statement
+MAX_PARAMETERS = 500
+
+
+class SqliteBackend:
+    def __init__(self, path):
+        database_dir = os.path.dirname(path)
+        if database_dir and not os.path.isdir(database_dir):
+            os.makedirs(database_dir)
+
+        logger.info("Using database: %s", path)
+        # statements are sent one at a time, transactions are opened explicitly
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._tables = set()
+        self._lock = threading.Lock()
+
+    def create_index(self, collection, unique=True):
+        index = f"{collection.name}_key" if unique else f"{collection.name}_key_non_unique"
+        with self._transaction(collection) as cursor:
+            cursor.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index} ON {collection.name} (_key)"
+            )
+
+    def find_one(self, collection, key):
+        with self._transaction(collection, immediate=False) as cursor:
+            row = self._find_row(cursor, collection, key)
+        return row[1] if row else None
+
+    def find_keys(self, collection, keys):
+        found = set()
+        with self._transaction(collection, immediate=False) as cursor:
+            for index in range(0, len(keys), MAX_PARAMETERS):
+                chunk = keys[index:index + MAX_PARAMETERS]
+                cursor.execute(
+                    f"SELECT _key FROM {collection.name} WHERE _key IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                found.update(key for key, in cursor.fetchall())
+        return found
+
+    def iter_keys(self, collection):
+        # read by slices, the lock is never held between two of them
+        last_key = None
+        while True:
+            with self._transaction(collection, immediate=False) as cursor:
+                if last_key is None:
+                    cursor.execute(f"SELECT _key FROM {collection.name} ORDER BY _key LIMIT 10000")
+                else:
+                    cursor.execute(
+                        f"SELECT _key FROM {collection.name} WHERE _key > ? ORDER BY _key LIMIT 10000", (last_key,)
+                    )
+                keys = [key for key, in cursor.fetchall()]
+            if not keys:
+                return
+            yield from keys
+            last_key = keys[-1]
+
+    def find_greater(self, collection, field, value):
+        with self._transaction(collection, immediate=False) as cursor:
+            cursor.execute(
+                f"SELECT document FROM {collection.name} WHERE json_extract(document, ?) > ?", (f"$.{field}", value)
+            )
+            return [json.loads(document) for document, in cursor.fetchall()]
+
+    def insert_one(self, collection, document):
+        with self._transaction(collection) as cursor:
+            self._insert(cursor, collection, document)
+
+    def update_one(self, collection, key, fields):
+        with self._transaction(collection) as cursor:
+            self._update(cursor, collection, key, fields)
+
+    def upsert_many(self, collection, documents):
+        with self._transaction(collection) as cursor:
+            for key, document in documents.items():
+                self._update(cursor, collection, key, document)
+
+    def set_max(self, collection, key, field, value):
+        with self._transaction(collection) as cursor:
+            row = self._find_row(cursor, collection, key)
+            if row and field in row[1] and row[1][field] >= value:
+                return
+            self._update(cursor, collection, key, {field: value}, row)
+
+    def increment(self, collection, key, field):
+        with self._transaction(collection) as cursor:
+            row = self._find_row(cursor, collection, key)
+            self._update(cursor, collection, key, {field: (row[1].get(field, 0) if row else 0) + 1}, row)
+
+    def acquire_lease(self, collection, key, owner, expires_at, now):
+        with self._transaction(collection) as cursor:
+            row = self._find_row(cursor, collection, key)
+            if row and row[1].get("owner") != owner and row[1].get("expires_at", 0) > now:
+                # held by another instance
+                return False
+            self._update(cursor, collection, key, {"owner": owner, "expires_at": expires_at}, row)
+        return True
+
+    def release_lease(self, collection, key, owner):
+        with self._transaction(collection) as cursor:
+            row = self._find_row(cursor, collection, key)
+            if row and row[1].get("owner") == owner:
+                cursor.execute(f"DELETE FROM {collection.name} WHERE rowid = ?", (row[0],))
+
+    def drop(self, collection):
+        with self._transaction(collection) as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {collection.name}")
+        self._tables.discard(collection.name)
+
+    @contextlib.contextmanager
+    def _transaction(self, collection, immediate=True):
+        with self._lock:
+            try:
+                cursor = self._connection.cursor()
+                if collection.name not in self._tables:
+                    cursor.execute(f"CREATE TABLE IF NOT EXISTS {collection.name} (_key, document TEXT NOT NULL)")
+                    self._tables.add(collection.name)
+                # taking the write lock up front keeps read-modify-write atomic across processes,
+                # reads only need a snapshot and don't hold back other processes' writes
+                cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN DEFERRED")
+                try:
+                    yield cursor
+                except BaseException:
+                    cursor.execute("ROLLBACK")
+                    raise
+                cursor.execute("COMMIT")
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyException(e) from e
+            except sqlite3.Error as e:
+                raise StorageException(e) from e
+
+    def _find_row(self, cursor, collection, key):
+        cursor.execute(f"SELECT rowid, document FROM {collection.name} WHERE _key = ? LIMIT 1", (key,))
+        row = cursor.fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _insert(self, cursor, collection, document):
+        cursor.execute(
+            f"INSERT INTO {collection.name} (_key, document) VALUES (?, ?)",
+            (document[collection.unique_key], json.dumps(document)),
+        )
+
+    def _update(self, cursor, collection, key, fields, row=None):
+        row = row or self._find_row(cursor, collection, key)
+        if not row:
+            self._insert(cursor, collection, {collection.unique_key: key, **fields})
+            return
+        cursor.execute(
+            f"UPDATE {collection.name} SET document = ? WHERE rowid = ?", (json.dumps({**row[1], **fields}), row[0])
+        )
@@ -1,2 +1,6 @@
 def get_feedback_out_of_5(user):
     return round(user["feedback_reputation"] * 5, 2)
+
+
+def get_config_value(config, key, default):
+    return config[key] if key in config else default